@@ -1,15 +1,47 @@
 from PyQt6 import QtWidgets
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QThread, pyqtSignal
 from ui import HELP_DIALOG, ABOUT_DIALOG, CLASS_TABLE
+from utils import CSV_LOADER
 
+import os
 import sys
 
 import MODEL
 
+
+class LoadWorker(QThread):
+    """Reads a CSV file off the GUI thread, a cancelled load stops at its next chunk."""
+    progress = pyqtSignal(int)
+    done = pyqtSignal(object)  # the frame read
+    failed = pyqtSignal(str)  # error of an unreadable file
+
+    def __init__(self, filename, parent=None):
+        super().__init__(parent)
+        self.filename = filename
+
+    def report(self, percent):
+        if self.isInterruptionRequested():
+            raise CSV_LOADER.LoadCancelled()
+        self.progress.emit(percent)
+
+    def run(self):
+        try:
+            frame = CSV_LOADER.read_csv(self.filename, self.report)
+        except CSV_LOADER.LoadCancelled:
+            return
+        except Exception as e:
+            if not self.isInterruptionRequested():
+                self.failed.emit(str(e))
+            return
+        if not self.isInterruptionRequested():
+            self.done.emit(frame)
+
+
 class Controller:
     def __init__(self, view, dataset=None):
         self.data = dataset
         self.view = view
+        self.loader = None  # LoadWorker of the file being read
         if self.view is not None:
             self.setup_connections()
             self.setup_menu()
@@ -93,16 +125,56 @@ class Controller:
                 QtWidgets.QMessageBox.critical(self.view, "Error", f"An error occurred while saving the file: {e}")
 
     def load_dataset(self):
-        if self.data:
-            del self.data
+        # a file still being read is dropped, the new choice starts over
+        if self.loader is not None:
+            self.loader.requestInterruption()
+            self.loader = None
+            self.show_dataset_info()
 
-        self.data = MODEL.Dataset()
         filename = QtWidgets.QFileDialog.getOpenFileName(self.view, 'Open File', 'datasets')
         if filename[0] == '':
             return
 
+        # the file is read in chunks in the background, the loaded dataset stays until it is complete
+        self.view.dataset_textbox.setText(f'Loading {os.path.basename(filename[0])}...')
+        loader = LoadWorker(filename[0], self.view)
+        loader.progress.connect(lambda percent: self.show_load_progress(loader, percent))
+        loader.done.connect(lambda frame: self.finish_load(loader, frame))
+        loader.failed.connect(lambda message: self.fail_load(loader, message))
+        self.loader = loader
+        loader.start()
+
+    def show_dataset_info(self):
+        if self.data and self.data.class_count > 0:
+            self.display_data()
+        else:
+            self.view.dataset_textbox.clear()
+
+    def show_load_progress(self, loader, percent):
+        if loader is self.loader:
+            self.view.dataset_textbox.setText(f'Loading {os.path.basename(loader.filename)}... {percent}%')
+
+    def fail_load(self, loader, message):
+        if loader is not self.loader:
+            return
+        self.loader = None
+        self.show_dataset_info()
+        QtWidgets.QMessageBox.critical(self.view, "Error", f"An error occurred while loading the file: {message}")
+
+    def finish_load(self, loader, frame):
+        if loader is not self.loader:
+            return
+        data = MODEL.Dataset()
+        data.load_from_csv(loader.filename, frame)
+        if data.class_count == 0:
+            self.fail_load(loader, "The file has no samples.")
+            return
+        self.loader = None
+
         # GUI changes for changing datasets without restarting the application
         if self.view.plot_widget and self.view.class_table and self.view.plot_layout:
+            # a layout of the old dataset still running must not reach the view
+            self.view.plot_widget.cancel_layout()
             self.view.plot_layout.removeWidget(self.view.plot_widget)
             del self.view.plot_widget
             self.view.plot_widget = None
@@ -120,6 +192,8 @@ class Controller:
             self.view.attribute_table_layout.addWidget(self.view.attribute_pl)
             self.view.attribute_pl_exists = True
 
-        self.data.load_from_csv(filename[0])
+        if self.data:
+            del self.data
+        self.data = data
         self.display_data()
         self.view.class_table = CLASS_TABLE.ClassTable(self.data, parent=self.view)
@@ -7,7 +7,7 @@ import random
 from ctgan import CTGAN
 from sklearn.preprocessing import MinMaxScaler, LabelEncoder
 
-from utils import COLORS
+from utils import COLORS, CSV_LOADER
 
 
 class Dataset:
@@ -46,11 +46,20 @@ class Dataset:
         self.vertex_in: np.ndarray = np.array([], dtype=float)  # for vertex clip option
         self.last_vertex_in: np.ndarray = np.array([], dtype=float)  # for last vertex clip option
 
+        # class-contiguous copy of the attribute values, built by update_features
+        self.features: Optional[np.ndarray] = None  # float64, the rows of each class together in class_names order
+        self.feature_names: List[str] = []  # attribute of each features column
+        self.class_codes: np.ndarray = np.array([], dtype=np.int32)  # class_names index of every features row
+        self.class_offsets: np.ndarray = np.array([0], dtype=np.int64)  # first features row of each class, then the row count
+
         # plot information
         self.plot_type: str = ''
         self.positions: List[float] = []
+        self.segment_index = None  # SPATIAL_INDEX.SegmentGrid over positions, rebuilt by GCA
+        self.layout_version: int = 0  # incremented by GCA on every new layout
+        self.layout_state = None  # attribute order, inversions, coefs and shifts the positions were computed from
         
-        self.overlap_indices = []
+        self.overlap_indices: np.ndarray = np.array([], dtype=bool)  # samples with a marker inside several sectors
         self.radial_bounds = {}
         
         self.axis_positions: List[float] = []
@@ -59,9 +68,11 @@ class Dataset:
         self.vertex_count: int = 0
 
         self.trace_mode: bool = False
+        self.density_mode: bool = False  # draw the lines of each class as a density texture
 
         self.coefs = []
         self.fitted = False
+        self.scaled_attributes: Optional[np.ndarray] = None  # min-max scaled features, cached by DCC
 
         self.active_attributes: np.ndarray = np.array([], dtype=bool)
         self.active_classes: List[bool] = []
@@ -70,14 +81,55 @@ class Dataset:
         
         self.class_order: List[int] = []
         self.attribute_order: List[int] = []
-        self.all_arc_lengths: List[int] = []
+        self.all_arc_lengths: np.ndarray = np.array([])  # cumulative DCC arc length of every features row and attribute
 
         self.axis_vertical_shifts = np.zeros(self.attribute_count)  # Store vertical shifts for PC axes
 
+    def clear_features(self):
+        """Drop the feature matrix and the DCC cache after sample values or attributes change."""
+        self.features = None
+        self.scaled_attributes = None
+
+    def encode_classes(self, labels):
+        """class_names index of every label, -1 for labels of unknown classes."""
+        return pd.Categorical(labels, categories=self.class_names).codes
+
+    def update_features(self):
+        """Build the class-contiguous feature matrix from the dataframe if it was cleared, cast to float32 only at the GPU upload."""
+        if self.features is not None:
+            return
+        class_codes = self.encode_classes(self.dataframe['class'])
+
+        # stable sort, so the rows of a class keep their frame order
+        rows = np.flatnonzero(class_codes >= 0)
+        if np.any(np.diff(class_codes[rows]) < 0):
+            rows = rows[np.argsort(class_codes[rows], kind='stable')]
+
+        self.feature_names = list(self.attribute_names)
+        self.features = self.dataframe[self.feature_names].to_numpy(dtype=np.float64)
+        if len(rows) != len(self.features) or np.any(np.diff(rows) != 1):
+            self.features = self.features[rows]
+        self.class_codes = class_codes[rows].astype(np.int32)
+        self.class_offsets = np.concatenate(([0], np.cumsum(np.bincount(self.class_codes, minlength=self.class_count))))
+
+    def feature_matrix(self, attributes=None):
+        """Feature rows of every class with the columns in attribute order, a view when no reordering is needed."""
+        self.update_features()
+        names = list(self.attribute_names if attributes is None else attributes)
+        if names == self.feature_names:
+            return self.features
+        return self.features[:, [self.feature_names.index(name) for name in names]]
+
+    def class_values(self, class_index, attributes=None):
+        """Feature rows of one class, sliced from feature_matrix."""
+        matrix = self.feature_matrix(attributes)
+        return matrix[self.class_offsets[class_index]:self.class_offsets[class_index + 1]]
+
     def duplicate_last_attribute(self):
         if self.dataframe is None or self.dataframe.empty:
             print("DataFrame is not loaded or is empty.")
             return
+        self.clear_features()
 
         last_attribute = self.dataframe.columns[-2]
         new_attribute = f'{last_attribute}_copy'
@@ -98,7 +150,7 @@ class Dataset:
             try:
                 # store inversions
                 inversions = self.attribute_inversions
-                df = pd.read_csv(self.filepath)
+                df = CSV_LOADER.read_csv(self.filepath)
                 self.load_frame(df)
                 # restore inversions
                 self.attribute_inversions = inversions
@@ -129,39 +181,67 @@ class Dataset:
             self.axis_vertical_shifts[i] = reference_mean - current_mean
     
     def relabel_samples(self, class_name: str):
-        self.dataframe.loc[self.clipped_samples, 'class'] = class_name
-        self.not_normalized_frame.loc[self.clipped_samples, 'class'] = class_name
-        # update the class counts
-        self.count_per_class = [self.dataframe['class'].tolist().count(name) for name in self.class_names]
+        self.clear_features()
+        # update the class counts, moving the relabeled samples from their old classes
+        old_codes = self.encode_classes(self.dataframe.loc[self.clipped_samples, 'class'])
+        count_per_class = np.asarray(self.count_per_class, dtype=int) - np.bincount(old_codes[old_codes >= 0], minlength=self.class_count)
+        if class_name in self.class_names:
+            count_per_class[self.class_names.index(class_name)] += len(old_codes)
+        self.count_per_class = count_per_class.tolist()
+
+        for frame in (self.dataframe, self.not_normalized_frame):
+            # categorical class columns of loaded files need the new label as a category first
+            if isinstance(frame['class'].dtype, pd.CategoricalDtype) and class_name not in frame['class'].cat.categories:
+                frame['class'] = frame['class'].cat.add_categories([class_name])
+            frame.loc[self.clipped_samples, 'class'] = class_name
         # sort the dataframe by class
         self.dataframe = self.dataframe.sort_values(by='class', ignore_index=True)
         self.not_normalized_frame = self.not_normalized_frame.sort_values(by='class', ignore_index=True)
 
-    def inject_datapoint(self, data_point: List[float], class_name: str):
-        # Create a new row for the normalized DataFrame
-        new_row_normalized = pd.DataFrame([data_point + [class_name]], columns=self.dataframe.columns)
-        
-        new_row_nonnormalized = pd.DataFrame([data_point + [class_name]], columns=self.not_normalized_frame.columns)
-        
-        # denormalize the new row by using the min and max of the original data csv
-        new_row_nonnormalized[self.attribute_names] = new_row_normalized[self.attribute_names] * (self.max_values - self.min_values) + self.min_values
-        
-        # Inject into the normalized DataFrame
-        self.dataframe = pd.concat([self.dataframe, new_row_normalized], ignore_index=True)
-        
-        # Inject into the non-normalized DataFrame
-        self.not_normalized_frame = pd.concat([self.not_normalized_frame, new_row_nonnormalized], ignore_index=True)
+    def insert_rows(self, rows: pd.DataFrame, not_normalized_rows: pd.DataFrame):
+        """Insert rows into both frames at the end of their class blocks, keeping counts and masks aligned."""
+        sample_count = len(self.dataframe.index)
+        frame_codes = self.encode_classes(self.dataframe['class'])
+        row_codes = self.encode_classes(rows['class'])
+
+        # last row of every class, new rows go right after it, rows of empty classes go to the end
+        class_ends = np.full(self.class_count, -1)
+        known = np.flatnonzero(frame_codes >= 0)
+        np.maximum.at(class_ends, frame_codes[known], known)
+        positions = np.full(len(rows.index), sample_count)
+        positions[row_codes >= 0] = np.where(class_ends >= 0, class_ends + 1, sample_count)[row_codes[row_codes >= 0]]
+
+        # one merge of old and new rows, new rows keep their given order within a class
+        order = np.insert(np.arange(sample_count), positions, np.arange(sample_count, sample_count + len(positions)))
+        if sample_count == 0:
+            self.dataframe = rows[self.dataframe.columns].reset_index(drop=True)
+            self.not_normalized_frame = not_normalized_rows[self.not_normalized_frame.columns].reset_index(drop=True)
+        else:
+            self.dataframe = pd.concat([self.dataframe, rows[self.dataframe.columns]], ignore_index=True).iloc[order].reset_index(drop=True)
+            self.not_normalized_frame = pd.concat([self.not_normalized_frame, not_normalized_rows[self.not_normalized_frame.columns]], ignore_index=True).iloc[order].reset_index(drop=True)
 
-        # update the frames so the new rows are at their class end index (class column)
-        self.dataframe = self.dataframe.sort_values(by='class', ignore_index=True)
-        self.not_normalized_frame = self.not_normalized_frame.sort_values(by='class', ignore_index=True)
+        self.sample_count = len(self.dataframe.index)
+        self.count_per_class = (np.asarray(self.count_per_class, dtype=int) + np.bincount(row_codes[row_codes >= 0], minlength=self.class_count)).tolist()
 
-        self.sample_count += 1
-        self.count_per_class[self.class_names.index(class_name)] += 1
-        
-        # update clipped_samples array with new sample
-        self.clipped_samples = np.append(self.clipped_samples, False)
-        self.clear_samples = np.append(self.clear_samples, False)
+        # new samples start unselected
+        self.clipped_samples = np.insert(np.asarray(self.clipped_samples, dtype=bool), positions, False)
+        self.clear_samples = np.insert(np.asarray(self.clear_samples, dtype=bool), positions, False)
+        self.vertex_in = np.insert(np.asarray(self.vertex_in, dtype=bool), positions, False)
+        self.last_vertex_in = np.insert(np.asarray(self.last_vertex_in, dtype=bool), positions, False)
+        self.clear_features()
+
+    def inject_datapoints(self, data_points, class_names):
+        """Inject normalized samples, denormalized with the min and max of the original data csv."""
+        new_rows_normalized = pd.DataFrame(np.asarray(data_points, dtype=float).reshape(-1, self.attribute_count), columns=self.attribute_names)
+        new_rows_normalized['class'] = list(class_names)
+
+        new_rows_nonnormalized = new_rows_normalized.copy()
+        new_rows_nonnormalized[self.attribute_names] = new_rows_normalized[self.attribute_names] * (self.max_values - self.min_values) + self.min_values
+
+        self.insert_rows(new_rows_normalized, new_rows_nonnormalized)
+
+    def inject_datapoint(self, data_point: List[float], class_name: str):
+        self.inject_datapoints([data_point], [class_name])
 
     def update_coef(self, attribute_index, new_coef_value):
         if 0 <= attribute_index < len(self.coefs):
@@ -172,9 +252,10 @@ class Dataset:
         df.insert(len(df.columns) - 1, 'class', df.pop('class'))
 
         # get class information
-        self.class_count = len(df['class'].unique())
-        self.class_names = df['class'].unique().tolist()  # Keep unique class names in their original order
-        self.count_per_class = [df['class'].tolist().count(name) for name in self.class_names]
+        class_codes, class_names = pd.factorize(df['class'], use_na_sentinel=False)
+        self.class_names = class_names.tolist()  # Keep unique class names in their original order
+        self.class_count = len(self.class_names)
+        self.count_per_class = np.bincount(class_codes, minlength=self.class_count).tolist()
         self.class_order = np.arange(0, self.class_count)
 
         # get class colors and lower case
@@ -220,6 +301,7 @@ class Dataset:
 
         # general dataframe
         self.dataframe = df
+        self.clear_features()
 
         if not_normal is not None:
             self.not_normalized_frame = not_normal
@@ -236,35 +318,38 @@ class Dataset:
             print("No samples selected for deletion.")
             return
 
-        # Create a boolean mask for rows to be deleted
-        bool_clipped = np.array(self.clipped_samples, dtype=bool)
+        # Create a boolean mask for rows to be kept
+        keep_rows = ~np.asarray(self.clipped_samples, dtype=bool)
+        deleted_codes = self.encode_classes(self.dataframe.loc[~keep_rows, 'class'])
+
+        # Drop the rows from both dataframes, the remaining rows keep their order
+        self.dataframe = self.dataframe.loc[keep_rows].reset_index(drop=True)
+        self.not_normalized_frame = self.not_normalized_frame.loc[keep_rows].reset_index(drop=True)
 
-        # Drop the rows from both dataframes
-        self.dataframe = self.dataframe.loc[~bool_clipped].reset_index(drop=True)
-        self.not_normalized_frame = self.not_normalized_frame.loc[~bool_clipped].reset_index(drop=True)
+        # Compact the clipping arrays with the same mask
+        self.clipped_samples = np.asarray(self.clipped_samples, dtype=bool)[keep_rows]
+        self.clear_samples = np.asarray(self.clear_samples, dtype=bool)[keep_rows]
+        self.vertex_in = np.asarray(self.vertex_in, dtype=bool)[keep_rows]
+        self.last_vertex_in = np.asarray(self.last_vertex_in, dtype=bool)[keep_rows]
 
         # Update class information
         self.sample_count = len(self.dataframe.index)
-        self.count_per_class = [self.dataframe['class'].tolist().count(name) for name in self.class_names]
-
-        # Initialize arrays for clipping options
-        self.clipped_samples = np.repeat(False, self.sample_count)
-        self.clear_samples = np.repeat(False, self.sample_count)
-        self.vertex_in = np.repeat(False, self.sample_count)
-        self.last_vertex_in = np.repeat(False, self.sample_count)
-
-        # Preserve the current class colors mapping
-        class_color_mapping = dict(zip(self.class_names, self.class_colors))
-
-        # Reload the frame to ensure consistency
-        self.load_frame(self.dataframe, self.not_normalized_frame)
-
-        # Restore the preserved class colors mapping
-        self.class_colors = [class_color_mapping[class_name] for class_name in self.class_names]
-
-        # sort the dataframe by class
-        self.dataframe = self.dataframe.sort_values(by='class', ignore_index=True)
-        self.not_normalized_frame = self.not_normalized_frame.sort_values(by='class', ignore_index=True)
+        count_per_class = np.asarray(self.count_per_class, dtype=int) - np.bincount(deleted_codes[deleted_codes >= 0], minlength=self.class_count)
+        self.count_per_class = count_per_class.tolist()
+        self.clear_features()
+
+        # Drop classes without samples left, keeping the colors, options and order of the others
+        keep_classes = count_per_class > 0
+        if not keep_classes.all():
+            class_indices = np.cumsum(keep_classes) - 1
+            self.class_names = [name for name, keep in zip(self.class_names, keep_classes) if keep]
+            self.class_colors = [color for color, keep in zip(self.class_colors, keep_classes) if keep]
+            self.count_per_class = count_per_class[keep_classes].tolist()
+            self.class_order = class_indices[[index for index in self.class_order if keep_classes[index]]]
+            self.active_markers = np.asarray(self.active_markers)[keep_classes]
+            self.active_classes = np.asarray(self.active_classes)[keep_classes]
+            self.active_sectors = np.asarray(self.active_sectors)[keep_classes]
+            self.class_count = len(self.class_names)
 
     def copy_clip(self):
         """
@@ -283,28 +368,8 @@ class Dataset:
             print("No clipped indices found.")
             return
 
-        # Filter rows to clone
-        cloned_rows = self.dataframe.iloc[clipped_indices].copy()
-
-        # Duplicate the selected rows
-        for i in range(len(cloned_rows)):
-            new_row = cloned_rows.iloc[i]
-            # append the new row to the dataframe and not_normalized_frame at their class end index (class column)
-            self.dataframe = self.dataframe._append(new_row, ignore_index=True)
-            self.not_normalized_frame = self.not_normalized_frame._append(new_row, ignore_index=True)
-            # update the frames so the new rows are at their class end index (class column)
-            self.dataframe = self.dataframe.sort_values(by='class', ignore_index=True)
-            self.not_normalized_frame = self.not_normalized_frame.sort_values(by='class', ignore_index=True)
-
-        # Update sample count and clipping arrays
-        self.sample_count = len(self.dataframe)
-        # update the class counts
-        self.count_per_class = [self.dataframe['class'].tolist().count(name) for name in self.class_names]
-        self.clipped_samples = np.append(self.clipped_samples, [False] * len(cloned_rows))
-        self.clear_samples = np.append(self.clear_samples, [False] * len(cloned_rows))
-        
-        self.vertex_in = np.append(self.vertex_in, [False] * len(cloned_rows))
-        self.last_vertex_in = np.append(self.last_vertex_in, [False] * len(cloned_rows))
+        # Duplicate the selected rows at the end of their class blocks
+        self.insert_rows(self.dataframe.iloc[clipped_indices], self.not_normalized_frame.iloc[clipped_indices])
 
     def generate_data(self, num_samples: int, epochs: int, retain_data: bool = False):
         """Generate a specified number of samples using CTGAN."""
@@ -337,15 +402,15 @@ class Dataset:
 
         # Clear the dataframe and inject synthetic samples
         if not retain_data:
-            self.dataframe = pd.DataFrame(columns=self.attribute_names + ['class'])
-            self.not_normalized_frame = pd.DataFrame(columns=self.attribute_names + ['class'])
-            # update clipped_samples array with new sample
-            self.clipped_samples = np.append(self.clipped_samples, False)
-            self.clear_samples = np.append(self.clear_samples, False)
-            self.sample_count = len(self.dataframe)
-            self.count_per_class = [self.dataframe['class'].tolist().count(name) for name in self.class_names]
-        for i in range(len(synthetic_features)):
-            self.inject_datapoint(synthetic_features.iloc[i].tolist(), synthetic_labels.iloc[i])
+            self.dataframe = self.dataframe.iloc[0:0]
+            self.not_normalized_frame = self.not_normalized_frame.iloc[0:0]
+            self.clipped_samples = np.array([], dtype=bool)
+            self.clear_samples = np.array([], dtype=bool)
+            self.vertex_in = np.array([], dtype=bool)
+            self.last_vertex_in = np.array([], dtype=bool)
+            self.sample_count = 0
+            self.count_per_class = [0] * self.class_count
+        self.inject_datapoints(synthetic_features[self.attribute_names].to_numpy(dtype=float), synthetic_labels.tolist())
 
     def move_samples(self, move_delta: int):
         """Move the selected samples up or down in the dataframe."""
@@ -361,7 +426,8 @@ class Dataset:
             return
 
         bool_clipped = np.array(self.clipped_samples, dtype=bool)
-        
+        self.clear_features()
+
         for attribute in self.attribute_names:
             normalized_range = self.dataframe[attribute].max() - self.dataframe[attribute].min()
             if normalized_range == 0:
@@ -380,10 +446,10 @@ class Dataset:
                 self.dataframe.loc[bool_clipped, attribute] += proportional_delta
                 self.not_normalized_frame.loc[bool_clipped, attribute] += not_normalized_proportional_delta
 
-    def load_from_csv(self, filename: str):
-        """Load the dataset from a CSV file."""
+    def load_from_csv(self, filename: str, frame: Optional[pd.DataFrame] = None):
+        """Load the dataset from a CSV file, or from the frame already read from it in the background."""
         try:
-            df = pd.read_csv(filename)
+            df = CSV_LOADER.read_csv(filename) if frame is None else frame
             self.name = os.path.basename(filename)
             self.filepath = filename
             self.load_frame(df)
@@ -400,12 +466,14 @@ class Dataset:
         scaler = MinMaxScaler(our_range)
         # Only normalize self.dataframe
         self.dataframe[self.attribute_names] = scaler.fit_transform(self.dataframe[self.attribute_names])
+        self.clear_features()
         return self.dataframe
 
     def normalize_col(self, col: int, our_range: Tuple[float, float]):
         """Normalize a specific column in the dataframe to the specified range."""
         scaler = MinMaxScaler(our_range)
         self.dataframe[self.attribute_names[col]] = scaler.fit_transform(self.dataframe[[self.attribute_names[col]]])
+        self.clear_features()
         return self.dataframe
 
     def roll_clips(self, roll_dir: int):
@@ -30,6 +30,10 @@ class View(QtWidgets.QMainWindow):
         self.cell_swap = QtWidgets.QTableWidget()
         self.plot_layout = self.findChild(QtWidgets.QVBoxLayout, 'plotDisplay')
 
+        # overlap counts published by the plot when its sectors change
+        self.overlap_stats = PLOT.OverlapStatistics(self)
+        self.overlap_stats.changed.connect(self.show_overlaps)
+
         # Setup context menu for rulesListWidget
         self.rulesListWidget.setContextMenuPolicy(QtCore.Qt.ContextMenuPolicy.CustomContextMenu)
         self.rulesListWidget.customContextMenuRequested.connect(self.openContextMenu)
@@ -80,17 +84,12 @@ class View(QtWidgets.QMainWindow):
             self.controller.data.rule_regions.pop(item_num)
 
             
-            self.controller.data.clear_samples = np.zeros(self.controller.data.sample_count)
-            # clip remaining rules and update clear_samples
-            for rule in self.controller.data.rule_regions.values():
-                for rect in rule[1]:
-                    positions = self.controller.data.positions
-                    CLIPPING.Clipping(rect, self.controller.data)
-                    CLIPPING.clip_samples(positions, rect, self.controller.data)
-            self.controller.data.clear_samples = np.add(self.controller.data.clear_samples, self.controller.data.clipped_samples)
+            # rebuild clear_samples from the cached masks of the remaining rules
+            rects = [rect for rule in self.controller.data.rule_regions.values() for rect in rule[1]]
+            self.controller.data.clear_samples = CLIPPING.combine_boxes(rects, self.controller.data)[0]
             self.rule_count -= 1
             del item
-            self.plot_widget.update()
+            self.plot_widget.invalidate_sectors()
             
     def openContextMenu(self, position):
         menu = QtWidgets.QMenu()
@@ -162,18 +161,10 @@ class View(QtWidgets.QMainWindow):
         elif key == QtCore.Qt.Key.Key_W:
             # move data samples up by 0.1 on all attributes and replot
             self.controller.data.move_samples(0.01)
-            back_color = self.controller.view.plot_widget.background_color
-            axes_color = self.controller.view.plot_widget.axes_color
-            self.create_plot()
-            self.controller.view.plot_widget.background_color = back_color
-            self.controller.view.plot_widget.axes_color = axes_color
+            self.plot_widget.update_data()
         elif key == QtCore.Qt.Key.Key_S:
             self.controller.data.move_samples(-0.01)
-            back_color = self.controller.view.plot_widget.background_color
-            axes_color = self.controller.view.plot_widget.axes_color
-            self.create_plot()
-            self.controller.view.plot_widget.background_color = back_color
-            self.controller.view.plot_widget.axes_color = axes_color
+            self.plot_widget.update_data()
         elif key == QtCore.Qt.Key.Key_P:
             # print dataframe information for clipped indices
             clipped_samples_bool = np.array(self.controller.data.clipped_samples, dtype=bool)
@@ -181,28 +172,14 @@ class View(QtWidgets.QMainWindow):
             # and not normalized frame
             print(self.controller.data.not_normalized_frame.loc[clipped_samples_bool])
         elif key == QtCore.Qt.Key.Key_C:
-            back_color = self.controller.view.plot_widget.background_color
-            axes_color = self.controller.view.plot_widget.axes_color
             self.controller.data.copy_clip()
             self.controller.display_data()
-            if self.plot_widget:
-                self.plot_layout.removeWidget(self.plot_widget)
-            self.plot_widget = PLOT.Plot(self.controller.data, self.highlight_overlaps_toggle, self.overlaps_textbox, self.controller.view.replot_overlaps_btn, parent=self)
-            self.plot_layout.addWidget(self.plot_widget)
-            self.controller.view.plot_widget.background_color = back_color
-            self.controller.view.plot_widget.axes_color = axes_color
+            self.plot_widget.update_data()
         elif key == QtCore.Qt.Key.Key_D:
             # delete all clipped samples from dataset
             self.controller.data.delete_clip()
             self.controller.display_data()
-            back_color = self.controller.view.plot_widget.background_color
-            axes_color = self.controller.view.plot_widget.axes_color
-            if self.plot_widget:
-                self.plot_layout.removeWidget(self.plot_widget)
-            self.plot_widget = PLOT.Plot(self.controller.data, self.highlight_overlaps_toggle, self.overlaps_textbox, self.controller.view.replot_overlaps_btn, parent=self, reset_zoom=[self.plot_widget.m_left, self.plot_widget.m_right, self.plot_widget.m_bottom, self.plot_widget.m_top])
-            self.plot_layout.addWidget(self.plot_widget)
-            self.controller.view.plot_widget.background_color = back_color
-            self.controller.view.plot_widget.axes_color = axes_color
+            self.plot_widget.update_data()
         elif key == QtCore.Qt.Key.Key_I:
             # inject a data point with a value of 0.5 for each attribute show option to pick class
             # using function def inject_datapoint(self, data_point: List[float], class_name: str):
@@ -213,10 +190,7 @@ class View(QtWidgets.QMainWindow):
             self.controller.data.inject_datapoint(data_point, class_name[0])
             
             self.controller.display_data()
-            if self.plot_widget:
-                self.plot_layout.removeWidget(self.plot_widget)
-            self.plot_widget = PLOT.Plot(self.controller.data, self.highlight_overlaps_toggle, self.overlaps_textbox, self.controller.view.replot_overlaps_btn, parent=self)
-            self.plot_layout.addWidget(self.plot_widget)
+            self.plot_widget.update_data()
         elif key == QtCore.Qt.Key.Key_G:
             dialog = QtWidgets.QDialog(self)
             dialog.setWindowTitle("Generate Data")
@@ -253,14 +227,7 @@ class View(QtWidgets.QMainWindow):
             else:
                 return
             self.controller.display_data()
-            back_color = self.controller.view.plot_widget.background_color
-            axes_color = self.controller.view.plot_widget.axes_color
-            if self.plot_widget:
-                self.plot_layout.removeWidget(self.plot_widget)
-            self.plot_widget = PLOT.Plot(self.controller.data, self.highlight_overlaps_toggle, self.overlaps_textbox, self.controller.view.replot_overlaps_btn, parent=self)
-            self.plot_layout.addWidget(self.plot_widget)
-            self.controller.view.plot_widget.background_color = back_color
-            self.controller.view.plot_widget.axes_color = axes_color
+            self.plot_widget.update_data()
         
         elif key == QtCore.Qt.Key.Key_R:
             # relabel the selected samples with a selected class
@@ -314,6 +281,10 @@ class View(QtWidgets.QMainWindow):
             # Create and show results table
             self.show_inference_results(results, X_test.index)
 
+        elif key == QtCore.Qt.Key.Key_M:
+            # toggle the per-class line density view
+            self.controller.data.density_mode = not self.controller.data.density_mode
+            self.plot_widget.update()
         elif key == QtCore.Qt.Key.Key_L:
             # if in parallel coordinates and there is selected samples, adjust the axis vertical shifts
             # adjust the vertical shifts so that the selected samples are in a straight horizontal line.
@@ -393,6 +364,11 @@ class View(QtWidgets.QMainWindow):
         if self.plot_widget:
             self.plot_widget.update()
 
+    def refresh_sectors(self):
+        # hidden samples and class toggles move the sectors and overlaps of the circular plots
+        if self.plot_widget:
+            self.plot_widget.invalidate_sectors()
+
     def axes_func(self):
         if not self.controller.data:
             WARNINGS.no_data_warning()
@@ -432,40 +408,48 @@ class View(QtWidgets.QMainWindow):
             print("No class data available to display in ClassTable.")
             return
 
-        background_color = None
-        axes_color = None
-        # if plot widget exists, save the current background color and axes color
-        if self.plot_widget:
-            background_color = self.plot_widget.background_color
-            axes_color = self.plot_widget.axes_color
-
         # remove initial placeholder
         if self.pl:
             self.plot_layout.removeWidget(self.pl)
-        if self.plot_widget:
-            self.plot_layout.removeWidget(self.plot_widget)
-
-        self.controller.data.positions = []
 
         selected_plot_type = self.plot_select.currentText()
 
         if selected_plot_type == 'Parallel Coordinates':
-            self.controller.data.plot_type = 'PC'
+            plot_type = 'PC'
         elif selected_plot_type == 'Dynamic Scaffold Coordinates 1':
-            self.controller.data.plot_type = 'DSC1'
+            plot_type = 'DSC1'
         elif selected_plot_type == 'Dynamic Scaffold Coordinates 2':
-            self.controller.data.plot_type = 'DSC2'
+            plot_type = 'DSC2'
         elif selected_plot_type == 'Shifted Paired Coordinates':
-            self.controller.data.plot_type = 'SPC'
+            plot_type = 'SPC'
         elif selected_plot_type == 'Static Circular Coordinates':
-            self.controller.data.plot_type = 'SCC'
+            plot_type = 'SCC'
         elif selected_plot_type == 'Dynamic Circular Coordinates':
-            self.controller.data.plot_type = 'DCC'
+            plot_type = 'DCC'
         else:
             return
 
-        self.plot_widget = PLOT.Plot(self.controller.data, self.highlight_overlaps_toggle, self.overlaps_textbox, self.controller.view.replot_overlaps_btn, parent=self)
-        
+        # the plot widget and its GL context are kept for the same dataset, the layout runs in the background
+        if not (self.plot_widget and self.plot_widget.data is self.controller.data):
+            self.controller.data.plot_type = plot_type
+            self.plot_widget = PLOT.Plot(self.controller.data, self.highlight_overlaps_toggle, self.overlap_stats, parent=self)
+            self.plot_widget.layout_progress.connect(self.show_layout_progress)
+            self.plot_widget.layout_finished.connect(self.show_plot_tables)
+            self.plot_widget.edit_finished.connect(self.statusBar().clearMessage)
+            self.plot_widget.layout_failed.connect(self.show_layout_error)
+            self.plot_layout.addWidget(self.plot_widget)
+        self.plot_widget.request_layout(plot_type)
+
+    def show_layout_progress(self, percent):
+        self.statusBar().showMessage(f"Computing layout... {percent}%")
+
+    def show_layout_error(self, message):
+        self.statusBar().showMessage(f"Layout failed: {message}")
+
+    def show_plot_tables(self):
+        # tables follow the attribute order of the layout that was just swapped in
+        self.statusBar().clearMessage()
+
         # class table placeholder
         if self.class_pl_exists:
             self.class_table_layout.removeWidget(self.class_pl)
@@ -481,8 +465,6 @@ class View(QtWidgets.QMainWindow):
 
         self.attribute_table = ATTRIBUTE_TABLE.AttributeTable(self.controller.data, self.replot_attributes, parent=self)
         self.attribute_table_layout.addWidget(self.attribute_table)
-
-        self.plot_layout.addWidget(self.plot_widget)
         
         if self.class_table:
             self.class_table_layout.removeWidget(self.class_table)
@@ -490,10 +472,6 @@ class View(QtWidgets.QMainWindow):
         self.controller.view.class_table = CLASS_TABLE.ClassTable(self.controller.data, parent=self)
         self.class_table_layout.addWidget(self.controller.view.class_table)
         
-        if background_color and axes_color:
-            self.plot_widget.background_color = background_color
-            self.plot_widget.axes_color = axes_color
-        
     def analyze_clip(self):
         if not self.plot_widget:
             WARNINGS.no_data_warning()
@@ -502,7 +480,13 @@ class View(QtWidgets.QMainWindow):
         if len(self.plot_widget.all_rect) == 0:
             self.clipped_area_textbox.setText('No clipping area selected.')
             return
-        CLIPPING.clip_files(self.controller.data, self.clipped_area_textbox)
+
+        # the splits are written in the format picked next to the button
+        file_format = self.clip_format_select.currentText().lower()
+        try:
+            CLIPPING.clip_files(self.controller.data, self.clipped_area_textbox, file_format)
+        except ImportError:
+            self.clipped_area_textbox.setText(f'{self.clip_format_select.currentText()} files require pyarrow, please install it or export CSV.')
 
     def undo_clip(self):
         if not self.plot_widget:
@@ -514,16 +498,11 @@ class View(QtWidgets.QMainWindow):
             # Remove the last rectangle
             self.plot_widget.all_rect.pop()
 
-            # Reset the clipping-related attributes before recalculating
-            self.controller.data.clipped_samples = np.zeros(self.controller.data.sample_count)
-            self.controller.data.vertex_in = np.zeros(self.controller.data.sample_count)
-            self.controller.data.last_vertex_in = np.zeros(self.controller.data.sample_count)
-
-            # Recalculate clipping for the remaining rectangles
-            for rect in self.plot_widget.all_rect:
-                positions = self.controller.data.positions
-                CLIPPING.Clipping(rect, self.controller.data)
-                CLIPPING.clip_samples(positions, rect, self.controller.data)
+            # Rebuild the selection from the cached masks of the remaining rectangles
+            clipped, vertex_in, last_vertex_in = CLIPPING.combine_boxes(self.plot_widget.all_rect, self.controller.data)
+            self.controller.data.clipped_samples = clipped
+            self.controller.data.vertex_in = vertex_in
+            self.controller.data.last_vertex_in = last_vertex_in
 
             # Update rule count if necessary
             if self.rule_count > 0:
@@ -559,6 +538,7 @@ class View(QtWidgets.QMainWindow):
         else:
             self.controller.data.clear_samples = np.add(self.controller.data.clear_samples, self.controller.data.vertex_in)
             self.controller.data.clipped_samples = np.zeros(self.controller.data.sample_count)
+        self.refresh_sectors()
 
     def remove_rules(self):
         if not self.plot_widget:
@@ -572,7 +552,7 @@ class View(QtWidgets.QMainWindow):
         
         self.rulesListWidget.clear()
         
-        self.plot_widget.update()
+        self.plot_widget.invalidate_sectors()
 
     def trace_mode_func(self):
         self.controller.data.trace_mode = not self.controller.data.trace_mode
@@ -652,7 +632,7 @@ class View(QtWidgets.QMainWindow):
         for i in range(self.rulesListWidget.count()):
             self.rulesListWidget.item(i).setCheckState(QtCore.Qt.CheckState.Checked)
         
-        self.plot_widget.update()
+        self.plot_widget.invalidate_sectors()
 
     def onRuleItemChanged(self, item):
         try:
@@ -672,28 +652,29 @@ class View(QtWidgets.QMainWindow):
             if rule_num < len(rule_keys):
                 rule = rules[rule_keys[rule_num]]
 
-                if item.checkState() == QtCore.Qt.CheckState.Checked:
-                    for rect in rule[1]:
-                        positions = self.controller.data.positions
-                        CLIPPING.Clipping(rect, self.controller.data)
-                        CLIPPING.clip_samples(positions, rect, self.controller.data)
-
-                    self.controller.data.clear_samples = np.subtract(self.controller.data.clear_samples, self.controller.data.clipped_samples)
-                    self.controller.data.clipped_samples = np.zeros(self.controller.data.sample_count)
-                else:
-                    for rect in rule[1]:
-                        positions = self.controller.data.positions
-                        CLIPPING.Clipping(rect, self.controller.data)
-                        CLIPPING.clip_samples(positions, rect, self.controller.data)
-                    self.controller.data.clear_samples = np.add(self.controller.data.clear_samples, self.controller.data.clipped_samples)
-                    self.controller.data.clipped_samples = np.zeros(self.controller.data.sample_count)
+                # the samples of the toggled rule stay cleared while another unchecked rule covers them
+                rule_samples = CLIPPING.combine_boxes(rule[1], self.controller.data)[0]
+                clear_samples = np.asarray(self.controller.data.clear_samples, dtype=bool)
+                self.controller.data.clear_samples = (clear_samples & ~rule_samples) | self.unchecked_rule_samples()
+                self.controller.data.clipped_samples = np.zeros(self.controller.data.sample_count)
                     
-                self.plot_widget.update()
+                self.plot_widget.invalidate_sectors()
             else:
                 print(f"Rule key {rule_num} is out of range.")
         except Exception as e:
             print(f"Error in onRuleItemChanged: {e}")
 
+    def unchecked_rule_samples(self):
+        # union of the cached masks of every rule whose checkbox is cleared
+        rule_keys = list(self.controller.data.rule_regions.keys())
+        rects = []
+        for row in range(self.rulesListWidget.count()):
+            item = self.rulesListWidget.item(row)
+            rule_num = int(item.text().split()[1][:-1]) - 1
+            if item.checkState() != QtCore.Qt.CheckState.Checked and 0 <= rule_num < len(rule_keys):
+                rects += self.controller.data.rule_regions[rule_keys[rule_num]][1]
+        return CLIPPING.combine_boxes(rects, self.controller.data)[0]
+
     def table_swap(self, event):
         table = event.source()
 
@@ -710,11 +691,19 @@ class View(QtWidgets.QMainWindow):
             return
         if self.controller.data.dataframe is None:
             return
+        # the frame columns follow the attribute order, SPC/DSC2 and the exports read it
         self.controller.data.attribute_names.append('class')
         self.controller.data.dataframe = self.controller.data.dataframe[self.controller.data.attribute_names]
-
         self.controller.data.attribute_names.pop()
-        self.controller.data.positions = []
+
+        if self.plot_widget.relayout():
+            # the plot keeps its GL context, only the attribute table is rebuilt
+            self.controller.data.active_attributes = np.repeat(True, self.controller.data.attribute_count)
+            self.attribute_table_layout.removeWidget(self.attribute_table)
+            self.attribute_table.deleteLater()
+            self.attribute_table = ATTRIBUTE_TABLE.AttributeTable(self.controller.data, self.replot_attributes, parent=self)
+            self.attribute_table_layout.addWidget(self.attribute_table)
+            return
         self.controller.data.active_attributes = np.repeat(True, self.controller.data.attribute_count)
         ATTRIBUTE_TABLE.reset_checkmarks(self.attribute_table, self.controller.data.vertex_count, self.controller.data.plot_type)
         if self.attribute_table:
@@ -747,6 +736,10 @@ class View(QtWidgets.QMainWindow):
             return
         self.plot_widget.replot_overlaps()
 
+    def show_overlaps(self, summary, has_overlaps):
+        self.overlaps_textbox.setText(summary)
+        self.replot_overlaps_btn.setEnabled(has_overlaps)
+
     def highlight_overlaps(self):
         if not self.plot_widget:
             WARNINGS.no_data_warning()
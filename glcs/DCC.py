@@ -2,95 +2,79 @@ import numpy as np
 from sklearn.preprocessing import MinMaxScaler
 from sklearn.discriminant_analysis import LinearDiscriminantAnalysis
 
+
+def scale_attributes(dataset):
+    """Min-max scale the feature matrix once and keep it on the dataset."""
+    scaler = MinMaxScaler((0, 1))
+    dataset.update_features()
+    dataset.scaled_attributes = scaler.fit_transform(dataset.features)
+
+    return dataset.scaled_attributes, dataset.class_codes
+
+
+def class_radius(dataset, class_index):
+    base_radius = (dataset.attribute_count / (2 * np.pi))
+
+    # Adjust the radius based on class index
+    if class_index < 2:
+        # First two classes share the first axis
+        radius_factor = 1
+    else:
+        # Subsequent classes each get their own axis, scaling geometrically
+        scale_factor = 2.1  # Adjust this factor to control the rate of radius increase
+        radius_factor = scale_factor * (class_index - 1)
+
+    return base_radius * radius_factor, radius_factor
+
+
+def update_positions(dataset, start):
+    """Recompute the arc sums from attribute start on, the vertices before it keep their positions."""
+    columns = [dataset.feature_names.index(name) for name in dataset.attribute_names[start:]]
+    coefArr = np.asarray(dataset.coefs, dtype=float)[start:] / 100
+    prefix = dataset.all_arc_lengths[:, start - 1:start] if start > 0 else 0
+    dataset.all_arc_lengths[:, start:] = prefix + np.cumsum(dataset.scaled_attributes[:, columns] * coefArr, axis=1)
+
+    for class_index in range(dataset.class_count):
+        radius, radius_factor = class_radius(dataset, class_index)
+        center_angle = dataset.all_arc_lengths[dataset.class_offsets[class_index]:dataset.class_offsets[class_index + 1], start:] * radius_factor / radius
+
+        positions = dataset.positions[class_index].reshape(-1, dataset.vertex_count, 2)
+        positions[:, start:, 0] = radius * np.sin(center_angle)
+        positions[:, start:, 1] = radius * np.cos(center_angle)
+
+
 class DCC:
     def __init__(self, dataset):
         dataset.minmax_arc_lengths = []
-        
-        working_df = dataset.dataframe.copy()
-        scaler = MinMaxScaler((0, 1))
-        working_df[dataset.attribute_names] = scaler.fit_transform(working_df[dataset.attribute_names])
-
-        dataset.normalized_dataframe = working_df
-
-        working_frame = working_df.copy()
-
-        # strip last column
-        working_frame = working_frame.iloc[:, 0:-1]
-        
-        scaler = MinMaxScaler((0, 1))
-        attributes_scaled = scaler.fit_transform(working_df[dataset.attribute_names])
-
-        # Prepare the data for LDA
-        X = attributes_scaled
-        y = working_df['class'].values
-        
-        # Fit LDA model first plot of DCC only per data loaded
-        if not dataset.fitted: 
-            lda = LinearDiscriminantAnalysis()
-            lda.fit(X, y)
-            lda_coefs = np.abs(lda.coef_).mean(axis=0)
-            dataset.fitted = True
-            dataset.coefs = lda_coefs
-            # sort the attributes by the coefficients in reverse order
-            sorted_indices = np.argsort(-lda_coefs)
-            dataset.attribute_names = list(np.array(dataset.attribute_names)[sorted_indices])
-            dataset.attribute_order = sorted_indices
-            dataset.coefs = dataset.coefs[sorted_indices]
-        
-        coefArr = dataset.coefs / 100
-        
-        for index, col in enumerate(working_frame.columns):
-            columnCoef = coefArr[index]
-            working_df[col] = columnCoef * working_df[col]
-
-        section_array = np.linspace(start=0, stop=1, num=dataset.vertex_count)
-
-        for class_index, class_name in enumerate(dataset.class_names):
-            base_radius = (dataset.attribute_count / (2 * np.pi))
-
-            # Adjust the radius based on class index
-            if class_index < 2:
-                # First two classes share the first axis
-                radius_factor = 1
-            else:
-                # Subsequent classes each get their own axis, scaling geometrically
-                scale_factor = 2.1  # Adjust this factor to control the rate of radius increase
-                radius_factor = scale_factor * (class_index - 1)
-
-            radius = base_radius * radius_factor
-
-            df_name = working_df[working_df['class'] == class_name]
-            df_name = df_name.drop(columns='class', axis=1)
-
-            x_coord = np.tile(section_array, reps=len(df_name.index))
-            y_coord = df_name.to_numpy().ravel()
-
-            MinE = dataset.attribute_count
-            MaxE = 0
-
-            arc_length = 0
-            arc_rule = 0
-
-            attribute_length = dataset.attribute_count * dataset.count_per_class[class_index]
-            for i in range(attribute_length):
-                if arc_rule >= dataset.attribute_count:
-                    arc_length = 0
-                    arc_rule = 0
-
-                arc_length += y_coord[i]
-
-                center_angle = arc_length * 360 / (2 * np.pi * radius) * radius_factor
-                center_angle = np.pi * center_angle / 180
-
-                x_coord[i] = radius * np.sin(center_angle)
-                y_coord[i] = radius * np.cos(center_angle)
-
-                arc_rule += 1
-
-            dataset.minmax_arc_lengths.append(MinE)
-            dataset.minmax_arc_lengths.append(MaxE)
-
-            pos_array = np.column_stack((x_coord, y_coord))
+
+        if dataset.scaled_attributes is None:
+            X, y = scale_attributes(dataset)
+
+            # Fit LDA model first plot of DCC only per data loaded
+            if not dataset.fitted:
+                lda = LinearDiscriminantAnalysis()
+                lda.fit(X, y)
+                lda_coefs = np.abs(lda.coef_).mean(axis=0)
+                dataset.fitted = True
+                # sort the attributes by the coefficients in reverse order
+                sorted_indices = np.argsort(-lda_coefs)
+                dataset.attribute_names = list(np.array(dataset.feature_names)[sorted_indices])
+                dataset.attribute_order = sorted_indices
+                dataset.coefs = lda_coefs[sorted_indices]
+
+        # cached columns in the current attribute order, so coefs[i] always weights attribute_names[i]
+        columns = [dataset.feature_names.index(name) for name in dataset.attribute_names]
+        coefArr = np.asarray(dataset.coefs, dtype=float) / 100
+        dataset.all_arc_lengths = np.cumsum(dataset.scaled_attributes[:, columns] * coefArr, axis=1)
+
+        for class_index in range(dataset.class_count):
+            dataset.minmax_arc_lengths.append(dataset.attribute_count)
+            dataset.minmax_arc_lengths.append(0)
+
+            radius, radius_factor = class_radius(dataset, class_index)
+            center_angle = dataset.all_arc_lengths[dataset.class_offsets[class_index]:dataset.class_offsets[class_index + 1]] * radius_factor / radius
+
+            pos_array = np.column_stack(((radius * np.sin(center_angle)).ravel(), (radius * np.cos(center_angle)).ravel()))
             dataset.positions.append(pos_array)
 
         dataset.axis_count = dataset.attribute_count
@@ -4,39 +4,23 @@ from sklearn.preprocessing import MinMaxScaler
 
 class DSC1:
     def __init__(self, dataset):
-        working_df = dataset.dataframe.copy()
         space = 1 / dataset.vertex_count
         scaler = MinMaxScaler((0, space))  # [0, 1 / vertex_count] scaling
-        working_df[dataset.attribute_names] = scaler.fit_transform(working_df[dataset.attribute_names])
+        scaled = scaler.fit_transform(dataset.feature_matrix())
 
         angle_array = np.repeat(45, repeats=dataset.vertex_count)
         angle_array[0] = 80
 
-        for name in dataset.class_names:
-            df_name = working_df[working_df['class'] == name]
-            df_name = df_name.drop(columns='class', axis=1)
+        # unit vector of every scaffold segment, computed once
+        radians = np.deg2rad(angle_array)
+        directions = np.column_stack((np.cos(radians), np.sin(radians)))
 
-            # positions
-            values = df_name.to_numpy()
-            values = values.ravel()
+        for class_index in range(dataset.class_count):
+            values = scaled[dataset.class_offsets[class_index]:dataset.class_offsets[class_index + 1]]
 
-            j = 0
-            scaffolds = np.asarray([[0, 0]])
-            for i in range(len(df_name.index) * dataset.vertex_count):
-                if i % dataset.vertex_count == 0:
-                    j = 0
-                    new_x = np.cos(np.deg2rad(angle_array[j])) * values[i]
-                    new_y = np.sin(np.deg2rad(angle_array[j])) * values[i]
-                    scaffolds = np.append(scaffolds, [[-1 + new_x, -1 + new_y]], 0)
-                else:
-                    j += 1
-                    new_x = np.cos(np.deg2rad(angle_array[j])) * values[i]
-                    new_y = np.sin(np.deg2rad(angle_array[j])) * values[i]
-                    scaffolds = np.append(scaffolds, [
-                        [scaffolds[i][0] + new_x, scaffolds[i][1] + new_y]], 0)
-
-            scaffolds = np.delete(scaffolds, 0, 0)
-            dataset.positions.append(scaffolds)
+            # positions, each vertex is the previous one plus its scaled unit vector
+            scaffolds = -1 + np.cumsum(values[:, :, None] * directions, axis=1)
+            dataset.positions.append(scaffolds.reshape(-1, 2))
 
         dataset.axis_positions = [[-1, -1], [-1, 1], [-1, -1], [1, -1]]
         dataset.axis_count = 2
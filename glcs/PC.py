@@ -2,25 +2,34 @@ import numpy as np
 import MODEL
 
 
-def compute_positions(data, df_name, section_array):
-    # Use a copy of the dataframe to avoid changing the original data
-    df_copy = df_name.copy()
-    for index, is_inverted in enumerate(data.attribute_inversions):
-        if is_inverted:
-            df_copy.iloc[:, index] = 1 - df_copy.iloc[:, index]
-
-    x_coord = np.tile(section_array, reps=len(df_copy.index))
-    y_coord = df_copy.to_numpy().ravel()
-    
+def compute_heights(data, values, columns):
+    # Work on a float copy to avoid changing the feature matrix
+    values = np.array(values, dtype=float)
+    inversions = np.asarray(data.attribute_inversions, dtype=bool)[columns]
+    values[:, inversions] = 1 - values[:, inversions]
+
     # Apply vertical shifts to the data points
-    for i in range(len(data.axis_vertical_shifts)):
-        shift_indices = range(i, len(y_coord), data.vertex_count)
-        y_coord[shift_indices] += data.axis_vertical_shifts[i]
-    
+    return values + np.asarray(data.axis_vertical_shifts, dtype=float)[columns]
+
+
+def compute_positions(data, values, section_array):
+    y_coord = compute_heights(data, values, np.arange(values.shape[1])).ravel()
+    x_coord = np.tile(section_array, reps=len(values))
+
     pos_array = np.column_stack((x_coord, y_coord))
     return pos_array
 
 
+def update_positions(data, columns):
+    """Move the vertices of the given axes after a swap, inversion or shift, the other vertices stay."""
+    names = [data.attribute_names[column] for column in columns]
+    for class_index in range(data.class_count):
+        heights = compute_heights(data, data.class_values(class_index, names), columns)
+        data.positions[class_index].reshape(-1, data.vertex_count, 2)[:, columns, 1] = heights
+
+    data.axis_positions = compute_axis_positions(data, np.linspace(start=0, stop=1, num=data.vertex_count))
+
+
 def compute_axis_positions(data, section_array):
     axis_vertex_array = []
     for idx in range(data.vertex_count):
@@ -41,13 +50,8 @@ class PC:
         # Create section_array based on vertex_count
         section_array = np.linspace(start=0, stop=1, num=data.vertex_count)
 
-        # Compute positions for each class and store in data.positions
-        data.positions = []
-        for class_name in data.class_names:
-            df_name = data.dataframe[data.dataframe['class'] == class_name]
-            df_name = df_name.drop(columns='class', axis=1)
-            pos_array = compute_positions(data, df_name, section_array)
-            data.positions.append(pos_array)
+        # Compute positions for each class from its slice of the feature matrix
+        data.positions = [compute_positions(data, data.class_values(class_index), section_array) for class_index in range(data.class_count)]
 
         # Compute axis positions
         data.axis_positions = compute_axis_positions(data, section_array)
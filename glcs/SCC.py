@@ -2,7 +2,7 @@ import numpy as np
 import MODEL
 
 
-def compute_coordinates(data, df, class_index):
+def compute_coordinates(data, values, class_index, columns=None):
     base_radius = (data.attribute_count / (2 * np.pi))
 
     # Adjust the radius based on class index
@@ -15,35 +15,30 @@ def compute_coordinates(data, df, class_index):
         radius_factor = scale_factor * (class_index - 1)
 
     radius = base_radius * radius_factor
-    section_array = np.linspace(0, 1, data.attribute_count)
-    x_coord = np.tile(section_array, reps=len(df.index))
-    y_coord = df.to_numpy().ravel()
+    values = np.asarray(values, dtype=float)
+    if columns is None:
+        columns = np.arange(data.attribute_count)
 
-    attribute_length = data.attribute_count * len(df.index)
-    arc_length = 0
-    arc_rule = 0
+    # inverted attributes are read as 1 - value, one mask over every row
+    inversions = np.asarray(data.attribute_inversions, dtype=bool)[columns]
+    values = np.where(inversions, 1 - values, values)
 
-    for i in range(attribute_length):
-        if arc_rule >= data.attribute_count:
-            arc_length = 0
-            arc_rule = 0
+    # attribute k of every sample sits at arc length k + value along the circle
+    arc_length = columns + values
+    center_angle = arc_length * radius_factor / radius
 
-        if data.attribute_inversions[arc_rule]:
-            arc_length += (1 - y_coord[i])
-        else:
-            arc_length += y_coord[i]
+    x_coord = radius * np.sin(center_angle)
+    y_coord = radius * np.cos(center_angle)
 
-        # Apply the radius factor to the angle calculation
-        center_angle = arc_length * 360 / (2 * np.pi * radius) * radius_factor
-        center_angle = np.pi * center_angle / 180
+    return np.column_stack((x_coord.ravel(), y_coord.ravel()))
 
-        x_coord[i] = radius * np.sin(center_angle)
-        y_coord[i] = radius * np.cos(center_angle)
 
-        arc_rule += 1
-        arc_length = arc_rule
-
-    return np.column_stack((x_coord, y_coord))
+def update_coordinates(data, columns):
+    """Move the vertices of the given attributes, each SCC vertex depends only on its own attribute."""
+    names = [data.attribute_names[column] for column in columns]
+    for class_index in range(data.class_count):
+        coordinates = compute_coordinates(data, data.class_values(class_index, names), class_index, columns)
+        data.positions[class_index].reshape(-1, data.vertex_count, 2)[:, columns] = coordinates.reshape(-1, len(columns), 2)
 
 
 class SCC:
@@ -52,9 +47,6 @@ class SCC:
         data.dataframe = data.normalize_data(our_range=(0, 1))
 
         # Compute coordinates for each class with adjusted radius
-        data.positions = [
-            compute_coordinates(data, data.dataframe[data.dataframe['class'] == class_name].drop('class', axis=1),
-                                class_index)
-            for class_index, class_name in enumerate(data.class_names)]
+        data.positions = [compute_coordinates(data, data.class_values(class_index), class_index) for class_index in range(data.class_count)]
 
         data.axis_count = data.attribute_count
@@ -1,47 +1,31 @@
 import numpy as np
-from sklearn.preprocessing import MinMaxScaler
 
 
 class SPC:
     def __init__(self, dataset):
-        working_df = dataset.dataframe.copy()
+        values = np.array(dataset.feature_matrix(), dtype=float)
 
+        # odd attributes span the full height, even ones their own section of the width
         section_array = np.linspace(start=-1, stop=1, num=dataset.vertex_count + 1)
-        j = 0
-        for i in range(dataset.attribute_count):
-            if i % 2 != 0:
-                scaler = MinMaxScaler((-1, 1))
-            else:
-                scaler = MinMaxScaler((section_array[j], section_array[j + 1]))
-                j += 1
-
-            # Apply the scaling
-            working_df[working_df.columns[i]] = scaler.fit_transform(working_df[[working_df.columns[i]]])
-
-        # Apply inversions to the scaled data if necessary
-        for i in range(dataset.attribute_count):
-            if dataset.attribute_inversions[i]:
-                # Calculate the min and max from the data for each attribute
-                attribute_min = working_df.iloc[:, i].min()
-                attribute_max = working_df.iloc[:, i].max()
-
-                # Calculate the midpoint
-                midpoint = (attribute_max + attribute_min) / 2
-
-                # Invert the attribute by reflecting it across the midpoint
-                working_df.iloc[:, i] = (midpoint - (working_df.iloc[:, i] - midpoint))
-
-        # After computing positions
-        for name in dataset.class_names:
-            df_name = working_df[working_df['class'] == name]
-            df_name = df_name.drop(columns='class', axis=1)
-
-            # Compute positions
-            values = df_name.to_numpy()
-            values = values.ravel()
-            values = np.reshape(values, (-1, 2))
-
-            dataset.positions.append(values)
+        lower = np.full(dataset.attribute_count, -1.0)
+        upper = np.ones(dataset.attribute_count)
+        lower[0::2] = section_array[:-1]
+        upper[0::2] = section_array[1:]
+
+        # min-max scaling of every column at once, constant columns go to the lower bound
+        minimum = values.min(axis=0, initial=np.inf)
+        span = values.max(axis=0, initial=-np.inf) - minimum
+        span[(span == 0) | ~np.isfinite(span)] = 1
+        values = lower + (values - minimum) / span * (upper - lower)
+
+        # Apply inversions by reflecting the scaled attribute across its midpoint
+        inversions = np.asarray(dataset.attribute_inversions[:dataset.attribute_count], dtype=bool)
+        if inversions.any() and len(values) > 0:
+            values[:, inversions] = values[:, inversions].min(axis=0) + values[:, inversions].max(axis=0) - values[:, inversions]
+
+        for class_index in range(dataset.class_count):
+            class_rows = values[dataset.class_offsets[class_index]:dataset.class_offsets[class_index + 1]]
+            dataset.positions.append(np.reshape(class_rows, (-1, 2)))
 
         # Calculate axis positions for visualization
         axis_vertex_array = [[-1, -1], [1, -1]]
@@ -43,7 +43,7 @@ def table_swap(table, dataset, plot, event):
     # Swap the class orders
     dataset.class_order[moved_from], dataset.class_order[moved_to] = dataset.class_order[moved_to], dataset.class_order[moved_from]
 
-    plot.update()
+    plot.invalidate_sectors()
 
 
 class ClassTable(QtWidgets.QTableWidget):
@@ -53,7 +53,7 @@ class ClassTable(QtWidgets.QTableWidget):
         super(ClassTable, self).__init__(parent)
 
         self.data = dataset
-        self.refresh_GUI.connect(self.parent().refresh)
+        self.refresh_GUI.connect(self.parent().refresh_sectors)
         
         if not (self.data.plot_type == 'SCC' or self.data.plot_type == 'DCC'):
             self.setColumnCount(4)
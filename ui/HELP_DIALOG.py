@@ -43,6 +43,7 @@ class HelpDialog(QDialog):
             Middle Click and Drag: Pan the plot.
             Middle Click and Hold: Grow selection box.
             Scroll Wheel: Zoom in and out on the plot.
+            M: Toggle the line density view of each class for large datasets.
         
         For deleting associative rules can right click and delete individual rules or click the clear all rules button.
         
@@ -1,4 +1,5 @@
 from OpenGL.GL import *
+from OpenGL import extensions
 import OpenGL.arrays.vbo as glvbo
 from PyQt6 import QtGui
 from PyQt6.QtCore import Qt
@@ -8,13 +9,23 @@ from PyQt6.QtGui import *
 from PyQt6.QtCore import *
 
 from typing import List
+import time
 import numpy as np
 from utils import GCA, CLIPPING, COLORS
 
 
+CURVE_SEGMENTS = 11  # points of each tessellated Bezier curve
+LOD_MIN_SAMPLES = 200  # fewest samples drawn while the view moves
+REFINE_STEP = 4  # growth of the subset between the refinement frames after the view settles
+
+
 def calculate_cubic_bezier_control_points(start, end, radius, attribute_count, is_inner, class_index):
+    # start and end may be single points or (..., 2) arrays of them
+    start, end = np.asarray(start, dtype=float), np.asarray(end, dtype=float)
+
     # Calculate midpoint between start and end points
-    midX, midY = (start[0] + end[0]) / 2, (start[1] + end[1]) / 2
+    mid = (start + end) / 2
+    midX, midY = mid[..., 0], mid[..., 1]
 
     # Adjust the radius factor based on class index
     if class_index < 2:
@@ -26,17 +37,12 @@ def calculate_cubic_bezier_control_points(start, end, radius, attribute_count, i
         factor = 0.01
         distance = np.sqrt(midX ** 2 + midY ** 2)
 
-        if distance == 0:
-            # Handle the special case where distance is zero
-            control1 = (midX, midY)
-            control2 = (midX, midY)
-        else:
-            # Calculate scaled control points
-            scale = factor * radius * radius_factor / distance
-            control1 = (midX * scale, midY * scale)
-            control2 = (midX * scale, midY * scale)
+        # Calculate scaled control points, a midpoint at the center stays there
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scale = np.where(distance == 0, 1, factor * radius * radius_factor / distance)
+        control = mid * scale[..., None]
 
-        return control1, control2
+        return control, control.copy()
 
     factor = 2
 
@@ -48,8 +54,8 @@ def calculate_cubic_bezier_control_points(start, end, radius, attribute_count, i
     angle_adjustment = np.pi / attribute_count / 3
     
     # Calculate control points using circle formula
-    control1 = (new_radius * np.cos(angle + angle_adjustment), new_radius * np.sin(angle + angle_adjustment))
-    control2 = (new_radius * np.cos(angle - angle_adjustment), new_radius * np.sin(angle - angle_adjustment))
+    control1 = new_radius * np.stack((np.cos(angle + angle_adjustment), np.sin(angle + angle_adjustment)), axis=-1)
+    control2 = new_radius * np.stack((np.cos(angle - angle_adjustment), np.sin(angle - angle_adjustment)), axis=-1)
 
     return control1, control2
 
@@ -64,38 +70,249 @@ def adjust_point_towards_center(point, atts=1):
     # Adjust point to move 0.025 units towards the center
     return [point[0] + adjust * direction_normalized[0], point[1] + adjust * direction_normalized[1]]
 
-def draw_cubic_bezier_curve(start, control1, control2, end, inner, atts):
-    # Draw a cubic Bezier curve using OpenGL's immediate mode.
-    segments = 11  # The number of line segments to use
-
-    if inner:
-        # Adjust both start and end points for inner curves
-        start_adjusted = adjust_point_towards_center(start, 1)
-        end_adjusted = adjust_point_towards_center(end, 1)
+def adjust_points_towards_center(points, atts=1):
+    # adjust_point_towards_center for a (..., 2) array of points
+    points = np.asarray(points, dtype=float)
+    norm = np.sqrt(points[..., 0] ** 2 + points[..., 1] ** 2)[..., None]
+    return points - atts * 0.0025 * points / norm
+
+def tessellate_cubic_bezier(start, control1, control2, end, segments=CURVE_SEGMENTS):
+    # points of every curve along its last axis, (..., 2) inputs give (..., segments, 2)
+    t = np.linspace(0, 1, segments)[:, None]
+    start, control1, control2, end = (point[..., None, :] for point in (start, control1, control2, end))
+    return (1 - t) ** 3 * start + 3 * (1 - t) ** 2 * t * control1 + 3 * (1 - t) * t ** 2 * control2 + t ** 3 * end
+
+def inner_classes(dataset, class_index):
+    # the first class in class order is drawn inside the axis, the second pushed outside it
+    is_inner = class_index == dataset.class_order[0] and dataset.class_count != 1
+    was_inner = len(dataset.class_order) > 1 and class_index == dataset.class_order[1]
+    return is_inner, was_inner
+
+def curve_endpoints(dataset, class_index):
+    # sample vertices moved in or out like the curves drawn through them
+    points = np.asarray(dataset.positions[class_index], dtype=float).reshape(-1, dataset.vertex_count, 2)
+    is_inner, was_inner = inner_classes(dataset, class_index)
+    if is_inner:
+        points = adjust_points_towards_center(points)
+    if was_inner:
+        points = adjust_points_towards_center(points, -dataset.attribute_count)
+    return points
+
+def curve_strip_length(vertex_count):
+    # consecutive curves share their joint point
+    return max(vertex_count - 1, 0) * (CURVE_SEGMENTS - 1) + 1
+
+def curve_strips(dataset, class_index, highlighted=False):
+    """Line strip through the tessellated Bezier curves of every sample of the class."""
+    points = np.asarray(dataset.positions[class_index], dtype=float).reshape(-1, dataset.vertex_count, 2)
+    is_inner, _ = inner_classes(dataset, class_index)
+
+    adjusted = curve_endpoints(dataset, class_index)
+    start, end = adjusted[:, :-1], adjusted[:, 1:]
+
+    # highlighted curves bend around the adjusted points, the others around the sample vertices
+    if highlighted:
+        control1, control2 = calculate_cubic_bezier_control_points(start, end, calculate_radius(dataset), dataset.attribute_count, is_inner, class_index)
     else:
-        # Use original points if not inner
-        start_adjusted = start
-        end_adjusted = end
-
-    glBegin(GL_LINE_STRIP)
-    for t in np.linspace(0, 1, segments):
-        # Cubic Bezier curve equation with adjusted start and end points
-        x = (1 - t) ** 3 * start_adjusted[0] + 3 * (1 - t) ** 2 * t * control1[0] + 3 * (1 - t) * t ** 2 * control2[0] + t ** 3 * end_adjusted[0]
-        y = (1 - t) ** 3 * start_adjusted[1] + 3 * (1 - t) ** 2 * t * control1[1] + 3 * (1 - t) * t ** 2 * control2[1] + t ** 3 * end_adjusted[1]
-        glVertex2f(x, y)
-    glEnd()
+        control1, control2 = calculate_cubic_bezier_control_points(points[:, :-1], points[:, 1:], calculate_radius(dataset), dataset.attribute_count, is_inner, class_index)
+
+    if is_inner:
+        start = adjust_points_towards_center(start)
+        end = adjust_points_towards_center(end)
+
+    curves = tessellate_cubic_bezier(start, control1, control2, end)
+    strips = np.concatenate((curves[:, :1, 0], curves[:, :, 1:].reshape(len(curves), -1, 2)), axis=1)
+    return strips.reshape(-1, 2).astype(np.float32)
+
+def highlight_strips(dataset):
+    # highlighted curves of every class in one array, sample by sample
+    return np.concatenate([curve_strips(dataset, i, highlighted=True) for i in range(dataset.class_count)])
+
+def curve_colors_key(dataset):
+    # everything the per-vertex curve colors depend on, except the alpha
+    return (tuple(tuple(int(v) for v in color) for color in dataset.class_colors), dataset.trace_mode, np.asarray(dataset.active_classes, dtype=bool).tobytes())
+
+def curve_alpha_key(dataset):
+    return dataset.attribute_alpha, np.asarray(dataset.active_attributes, dtype=bool).tobytes()
+
+def curve_point_curves(dataset):
+    # curve of every strip point, the first point belongs to the first curve
+    return np.concatenate(([0], np.repeat(np.arange(max(dataset.vertex_count - 1, 0)), CURVE_SEGMENTS - 1)))
+
+def curve_alpha(dataset):
+    """Alpha of every point of one curve strip, faded for the attributes switched off by the slider."""
+    h = np.arange(1, max(dataset.vertex_count - 1, 0) + 1)
+    alpha = np.clip(np.where(np.asarray(dataset.active_attributes, dtype=bool)[h], dataset.attribute_alpha, 255), 0, 255)
+    return alpha[curve_point_curves(dataset)].astype(np.uint8)
+
+def curve_colors(dataset):
+    """Per-vertex RGBA of the curve strips, every point after a joint takes the color of its curve."""
+    curve_count = max(dataset.vertex_count - 1, 0)
+    h = np.arange(1, curve_count + 1)
+    point_curves = curve_point_curves(dataset)
+    alpha = curve_alpha(dataset)
+
+    colors = []
+    hue_shift_amount = 0.02
+    for class_index in range(dataset.class_count):
+        sample_count = len(dataset.positions[class_index]) // dataset.vertex_count
+        rgba = np.empty((sample_count, len(point_curves), 4), dtype=np.uint8)
+        rgba[:, :, 3] = alpha
+
+        if dataset.trace_mode and dataset.active_classes[class_index]:
+            # the hue keeps shifting from curve to curve through the drawn classes
+            amounts = hue_shift_amount + 0.02 * np.arange(sample_count * curve_count)
+            hue_shift_amount += 0.02 * sample_count * curve_count
+            rgb = COLORS.shift_hues(dataset.class_colors[class_index], amounts).reshape(sample_count, curve_count, 3)
+        else:
+            # Apply a hue shift for the last attribute
+            shifts = np.where(h == dataset.attribute_count - 1, 0.1, 0)
+            rgb = np.broadcast_to(COLORS.shift_hues(dataset.class_colors[class_index], shifts), (sample_count, curve_count, 3))
+
+        rgba[:, :, :3] = rgb[:, point_curves]
+        colors.append(rgba.reshape(-1, 4))
+    return colors
+
+def class_sector(dataset, class_index, visible):
+    """Closest and furthest curve end of the class by angle, None when no sample is drawn."""
+    offsets = sample_offsets(dataset)
+    shown = visible[offsets[class_index]:offsets[class_index + 1]]
+    ends = curve_endpoints(dataset, class_index)[shown, 1:]
+    if not ends.size:
+        return None
+
+    angles = calculate_angle(ends[..., 0], ends[..., 1])
+
+    closest = None
+    last = dataset.attribute_count - 2  # curve ending at the last attribute
+    if 0 <= last < angles.shape[1]:
+        closest = ends[np.argmin(angles[:, last]), last]
+    furthest = ends.reshape(-1, 2)[np.argmax(angles)]
+    return closest, furthest
+
+def sector_angles(dataset, closest, furthest):
+    # start and end angle of the sector spanned by a class's closest and furthest curve ends
+    closest_angle = np.arctan2(closest[1], closest[0])
+    furthest_angle = np.arctan2(furthest[1], furthest[0])
+
+    if dataset.plot_type == 'SCC':
+        # Adjust angles to be positive
+        closest_angle = closest_angle if closest_angle >= 0 else closest_angle + 2 * np.pi
+        furthest_angle = furthest_angle if furthest_angle >= 0 else furthest_angle + 2 * np.pi
+    elif dataset.plot_type == 'DCC':
+        # Ensure start_angle < end_angle for drawing the sector correctly
+        if closest_angle < -np.pi / 2:
+            closest_angle += 2 * np.pi
+        if furthest_angle < -np.pi / 2:
+            furthest_angle += 2 * np.pi
+        closest_angle = closest_angle if closest_angle > furthest_angle else closest_angle
+        furthest_angle = furthest_angle if furthest_angle < closest_angle else furthest_angle - 2 * np.pi
+    if closest_angle > furthest_angle:
+        closest_angle, furthest_angle = furthest_angle, closest_angle
+    return closest_angle, furthest_angle
 
 def calculate_angle(x, y):
+    # works on scalars or arrays
     angle = np.arctan2(x, y)
-    if angle < 0:
-        angle += 2 * np.pi
-    return angle
+    return np.where(angle < 0, angle + 2 * np.pi, angle)
 
 def is_point_in_sector(point, start_angle, end_angle):
-    # Calculate the angle and distance from the start angle to the end angle
-    angle = np.arctan2(point[1], point[0])
-    return start_angle <= angle <= end_angle
+    # Calculate the angle and distance from the start angle to the end angle, point may be a (..., 2) array
+    angle = np.arctan2(point[..., 1], point[..., 0])
+    return (start_angle <= angle) & (angle <= end_angle)
+
+def marker_positions(dataset, class_index):
+    # markers of the inner classes sit further in or out than their curves
+    points = np.asarray(dataset.positions[class_index], dtype=float).reshape(-1, dataset.vertex_count, 2)
+    is_inner, was_inner = inner_classes(dataset, class_index)
+    if is_inner:
+        points = adjust_points_towards_center(points, dataset.attribute_count)
+    if was_inner:
+        points = adjust_points_towards_center(points, -dataset.attribute_count)
+    return points
+
+def sector_overlaps(dataset, sectors):
+    """
+    Markers inside more than one sector. Returns the mask of samples with such a marker,
+    the count of those samples per class and the (samples, vertices) marker mask of each class.
+    """
+    offsets = sample_offsets(dataset)
+    overlap_indices = np.zeros(offsets[-1], dtype=bool)
+    overlap_points = [0 for _ in range(dataset.class_count)]
+    marker_overlaps = []
+
+    for class_index in range(dataset.class_count):
+        points = marker_positions(dataset, class_index)
+        sector_count = np.zeros(points.shape[:2], dtype=int)
+        if dataset.active_markers[class_index]:
+            for sector in sectors:
+                sector_count += is_point_in_sector(points, sector['start_angle'], sector['end_angle'])
+        overlapping = sector_count > 1
+        marker_overlaps.append(overlapping)
+
+        samples = overlapping.any(axis=1)
+        overlap_indices[offsets[class_index]:offsets[class_index + 1]] = samples
+        overlap_points[class_index] = int(np.count_nonzero(samples))
+
+    return overlap_indices, overlap_points, marker_overlaps
+
+def circular_overlaps(dataset):
+    """
+    Sectors of the visible curves of every class and the markers inside more than one of them.
+    Sets the overlap fields of the dataset and returns the sector ends of each class, the sectors,
+    and the overlapping markers of each class vertex by vertex with the (firsts, counts) of every vertex.
+    """
+    visible = ~CLIPPING.sample_mask(dataset, 'clear_samples')
+    class_sectors = [class_sector(dataset, i, visible) for i in range(dataset.class_count)]
+    sectors = []
+    for class_index, sector in enumerate(class_sectors):
+        if dataset.active_classes[class_index] and sector is not None and sector[0] is not None and sector[1] is not None:
+            start_angle, end_angle = sector_angles(dataset, *sector)
+            sectors.append({'start_angle': start_angle, 'end_angle': end_angle})
+
+    dataset.overlap_indices, dataset.overlap_points, marker_overlaps = sector_overlaps(dataset, sectors)
+    markers, ranges = [], []
+    for class_index, overlapping in enumerate(marker_overlaps):
+        # overlapping markers vertex by vertex, so each marker index is one range
+        points = marker_positions(dataset, class_index).transpose(1, 0, 2)[overlapping.T]
+        counts = np.count_nonzero(overlapping, axis=0)
+        markers.append(points.astype(np.float32) if len(points) else np.zeros((1, 2), dtype=np.float32))
+        ranges.append((np.cumsum(counts) - counts, counts))
+    return class_sectors, sectors, markers, ranges
+
+def overlap_summary(dataset):
+    overlap_summary = ""
+    for i in range(dataset.class_count):
+        overlap_summary += f"Class {i + 1} {dataset.class_names[dataset.class_order[i]]}: {dataset.overlap_points[i]}\n"
+    total_overlaps = int(np.count_nonzero(dataset.overlap_indices))
+    overlap_summary += f"Total Overlaps: {total_overlaps} / {dataset.sample_count} samples\n= {round(100 * (total_overlaps / dataset.sample_count), 2)}% overlap for {round(100 * (1 - (total_overlaps / dataset.sample_count)), 2)}% accuracy.\n"
+    return overlap_summary
     
+class OverlapStatistics(QObject):
+    """
+    Overlap counts of the circular plots, updated by the plot where its sectors or markers are
+    invalidated, never from paintGL. The view shows them through the changed signal.
+    """
+    changed = pyqtSignal(str, bool)  # summary text and whether any sample overlaps
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.summary = ''
+        self.has_overlaps = False
+
+    def set_summary(self, summary, has_overlaps):
+        if (summary, has_overlaps) == (self.summary, self.has_overlaps):
+            return
+        self.summary, self.has_overlaps = summary, has_overlaps
+        self.changed.emit(summary, has_overlaps)
+
+    def update(self, dataset):
+        self.set_summary(overlap_summary(dataset), bool(np.any(dataset.overlap_indices)))
+
+    def reset(self):
+        self.set_summary('Requires Circular Coordinates\n\nSelect SCC or DCC to view overlaps.', False)
+
+
 def draw_filled_sector(start_angle, end_angle, radius, segments=100):
     """
     Draws a filled sector (part of a circle) between two angles with a specified radius.
@@ -107,54 +324,17 @@ def draw_filled_sector(start_angle, end_angle, radius, segments=100):
         glVertex2f(np.cos(angle) * radius, np.sin(angle) * radius)
     glEnd()
 
-def draw_highlighted_curves(dataset, line_vao):
+def draw_highlighted_curves(dataset, highlights):
     glEnable(GL_BLEND)
     glEnable(GL_LINE_SMOOTH)
     glHint(GL_LINE_SMOOTH_HINT, GL_NICEST)
     glColor3ub(255, 255, 0)
     glLineWidth(2)
-    
-    radius = calculate_radius(dataset)
-    class_count_one = dataset.class_count == 1
 
-    for class_index in range(dataset.class_count):
-        if dataset.active_classes[class_index]:
-            glBindVertexArray(line_vao[class_index])
-            datapoint_count = 0
-            size_index = 0
-            for j in range(dataset.class_count):
-                if j < class_index:
-                    size_index += dataset.count_per_class[j]
-            was_inner = False
-            is_inner = (class_index == dataset.class_order[0]) and not class_count_one
-            if len(dataset.class_order) > 1:
-                was_inner = (class_index == dataset.class_order[1])
-            for j in range(0, len(dataset.positions[class_index]), dataset.vertex_count):
-                if size_index + datapoint_count < len(dataset.vertex_in):
-                    if dataset.vertex_in[size_index + datapoint_count]:
-                        if dataset.clear_samples[size_index + datapoint_count]:
-                            datapoint_count += 1
-                            continue
-                        for h in range(1, dataset.vertex_count):
-                            if h > dataset.attribute_count:
-                                continue
-
-                            start = dataset.positions[class_index][j + h - 1]
-                            end = dataset.positions[class_index][j + h]
-
-                            # Adjust start and end for inner classes
-                            if is_inner:
-                                start = adjust_point_towards_center(start)
-                                end = adjust_point_towards_center(end)
-                            if was_inner:
-                                start = adjust_point_towards_center(start, -dataset.attribute_count)
-                                end = adjust_point_towards_center(end, -dataset.attribute_count)
-
-                            control1, control2 = calculate_cubic_bezier_control_points(start, end, radius, dataset.attribute_count, is_inner, class_index)
-                            draw_cubic_bezier_curve(start, control1, control2, end, is_inner, dataset.attribute_count)
-                datapoint_count += 1
-            
-            glBindVertexArray(0)
+    # the highlighted curves of every class share one buffer in sample order
+    highlighted = CLIPPING.sample_mask(dataset, 'vertex_in') & ~CLIPPING.sample_mask(dataset, 'clear_samples')
+    highlights.draw(dataset, highlighted, curve_strip_length(dataset.vertex_count))
+
     glLineWidth(1)
     glDisable(GL_BLEND)
 
@@ -170,94 +350,147 @@ def calculate_radius(data):
     radius = circumference / ((2 + data.attribute_count / 100) * np.pi)
     return radius
 
-def draw_unhighlighted_nd_points(dataset, class_vao):
+def sample_offsets(dataset):
+    # global index of the first sample of each class, samples are grouped by class
+    return dataset.class_offsets
+
+def sample_firsts(dataset, class_index, mask, stride=None):
+    # first vertex of every sample of the class selected by the global sample mask
+    offsets = sample_offsets(dataset)
+    selected = np.flatnonzero(mask[offsets[class_index]:offsets[class_index + 1]])
+    return (selected * (stride or dataset.vertex_count)).astype(np.int32)
+
+def strip_segment_indices(firsts, vertex_count):
+    # GL_LINES index pairs of every segment of the line strips starting at firsts
+    segments = np.arange(max(vertex_count - 1, 0))[:, None] + np.arange(2)
+    return (np.asarray(firsts, dtype=np.uint32)[:, None, None] + segments.astype(np.uint32)).ravel()
+
+def stratified_subset(dataset, budget):
+    """Mask of about budget samples spread evenly through every class, each class keeping its share of the samples."""
+    offsets = np.asarray(sample_offsets(dataset))
+    counts = np.diff(offsets)
+    keep = np.minimum(counts, np.ceil(counts * (budget / max(offsets[-1], 1))).astype(int))
+    # position of every kept sample among the kept samples of its class, stretched over the class
+    rank = np.arange(keep.sum()) - np.repeat(np.cumsum(keep) - keep, keep)
+    spread = rank * np.repeat(counts - 1, keep) // np.repeat(np.maximum(keep - 1, 1), keep)
+    subset = np.zeros(offsets[-1], dtype=bool)
+    subset[np.repeat(offsets[:-1], keep) + spread] = True
+    return subset
+
+def make_vertex_array(position_vbo, color_vbo=None):
+    # vertex array reading 2D float positions and optional RGBA byte colors
+    vao = glGenVertexArrays(1)
+    glBindVertexArray(vao)
+    position_vbo.bind()
+    glEnableClientState(GL_VERTEX_ARRAY)
+    glVertexPointer(2, GL_FLOAT, 0, None)
+    if color_vbo is not None:
+        color_vbo.bind()
+        glEnableClientState(GL_COLOR_ARRAY)
+        glColorPointer(4, GL_UNSIGNED_BYTE, 0, None)
+    glBindVertexArray(0)
+    return vao
+
+def draw_line_strips(firsts, vertex_count, mode=GL_LINE_STRIP):
+    if len(firsts):
+        glMultiDrawArrays(mode, firsts, np.full(len(firsts), vertex_count, dtype=np.int32), len(firsts))
+
+def polyline_colors_key(dataset):
+    # everything the per-vertex polyline colors depend on, except the alpha
+    return (tuple(tuple(int(v) for v in color) for color in dataset.class_colors), dataset.trace_mode, tuple(dataset.class_order), np.asarray(dataset.active_classes, dtype=bool).tobytes())
+
+def polyline_alpha_key(dataset):
+    return dataset.attribute_alpha, np.asarray(dataset.active_attributes, dtype=bool).tobytes(), bool(np.any(dataset.clipped_samples))
+
+def polyline_alpha(dataset):
+    """Alpha of each vertex of a polyline, vertex m fades with the attribute of the segment ending at it."""
+    sub_alpha = 100 if np.any(dataset.clipped_samples) else 0
+    active = np.asarray(dataset.active_attributes, dtype=bool)[np.maximum(np.arange(dataset.vertex_count) - 1, 0)]
+    return np.clip(np.where(active, dataset.attribute_alpha, 255) - sub_alpha, 0, 255).astype(np.uint8)
+
+def polyline_colors(dataset):
+    """Per-vertex RGBA of every class, vertex m carries the color of the segment ending at it (flat shading)."""
+    vertex_count = dataset.vertex_count
+    vertex_alpha = polyline_alpha(dataset)
+
+    sample_colors = [np.tile(np.asarray(dataset.class_colors[i][:3], dtype=np.uint8), (len(dataset.positions[i]) // vertex_count, 1)) for i in range(dataset.class_count)]
+
+    if dataset.trace_mode:
+        # the hue keeps shifting from sample to sample through the drawn classes, each shift adding to the last
+        hue_shift_amount = 0.02
+        for i in dataset.class_order[::-1]:
+            if not dataset.active_classes[i]:
+                continue
+            amounts = hue_shift_amount + 0.02 * np.arange(len(sample_colors[i]))
+            hue_shift_amount += 0.02 * len(sample_colors[i])
+            sample_colors[i][:] = COLORS.shift_hues(dataset.class_colors[i], np.cumsum(amounts))
+
+    colors = []
+    for rgb in sample_colors:
+        rgba = np.empty((len(rgb), vertex_count, 4), dtype=np.uint8)
+        rgba[:, :, :3] = rgb[:, None, :]
+        rgba[:, :, 3] = vertex_alpha
+        colors.append(rgba.reshape(-1, 4))
+    return colors
+
+def draw_unhighlighted_nd_points(dataset, buffers, subset=None):
     glEnable(GL_BLEND)
     glEnable(GL_LINE_SMOOTH)
     glHint(GL_LINE_SMOOTH_HINT, GL_NICEST)
     glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
     glLineWidth(1)
+    glShadeModel(GL_FLAT)  # each segment takes the color of its end vertex
 
-    hue_shift_amount = 0.02
+    visible = ~CLIPPING.sample_mask(dataset, 'clear_samples')
+    if subset is not None:
+        visible &= subset
 
     # Loop through classes in class order
+    glBindVertexArray(buffers.shaded_vao)
     for i in dataset.class_order[::-1]:
-        datapoint_cnt = 0
-        size_index = 0
-
-        # Draw polylines and markers
         if dataset.active_classes[i]:
-            # Adjust color based on trace mode
-            color = dataset.class_colors[i]
-            glBindVertexArray(class_vao[i])
-
-            for j in range(dataset.class_count):
-                if j < i:
-                    size_index += dataset.count_per_class[j]
-
-            # Iterate over positions for polylines
-            for l in range(0, len(dataset.positions[i]), dataset.vertex_count):
-                
-                if dataset.trace_mode:
-                    color = COLORS.shift_hue(color, hue_shift_amount)
-                    hue_shift_amount += 0.02
-                
-                if size_index + datapoint_cnt < len(dataset.vertex_in):
-                    if dataset.clear_samples[size_index + datapoint_cnt]:
-                        datapoint_cnt += 1
-                        continue
-
-                sub_alpha = 0
-                if any(dataset.clipped_samples):
-                    sub_alpha = 100
-
-                glBegin(GL_LINES)
-                for m in range(1, dataset.vertex_count):
-                    glColor4ub(color[0], color[1], color[2], dataset.attribute_alpha - sub_alpha if dataset.active_attributes[m - 1] else 255 - sub_alpha)
-                    glVertex2f(dataset.positions[i][l + m - 1][0], dataset.positions[i][l + m - 1][1])
-                    glVertex2f(dataset.positions[i][l + m][0], dataset.positions[i][l + m][1])
-                glEnd()
-
-                datapoint_cnt += 1
-            glBindVertexArray(0)
+            draw_line_strips(buffers.class_first[i] + sample_firsts(dataset, i, visible), dataset.vertex_count)
+    glBindVertexArray(0)
 
+    glShadeModel(GL_SMOOTH)
     glDisable(GL_BLEND)
 
-def draw_unhighlighted_nd_point_vertices(dataset, marker_vao):
+def draw_unhighlighted_nd_point_vertices(dataset, buffers, subset=None):
     glEnable(GL_BLEND)
     glEnable(GL_LINE_SMOOTH)
     glHint(GL_LINE_SMOOTH_HINT, GL_NICEST)
     glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
     glLineWidth(1)
     
+    # markers index into the layout buffer, vertex by vertex
+    glBindVertexArray(buffers.line_vao)
+
     # Loop through classes in class order
     for i in dataset.class_order[::-1]:
-        size_index = 0
-
         # Draw polylines and markers
         if dataset.active_classes[i]:
             # Adjust color based on trace mode
             color = dataset.class_colors[i]
             class_color = color
 
-            for j in range(dataset.class_count):
-                if j < i:
-                    size_index += dataset.count_per_class[j]
-                    
             if dataset.active_markers[i]:
                 # Draw markers
                 for j in range(dataset.vertex_count):
-                    glBindVertexArray(marker_vao[i * dataset.vertex_count + j])
                     glPointSize(5 if j < dataset.vertex_count - 1 else 7)  # Different size for the last marker
 
                     # Apply adjusted color for each marker
                     glColor4ub(class_color[0], class_color[1], class_color[2], dataset.attribute_alpha if dataset.active_attributes[j] else 255)
-                    glDrawArrays(GL_POINTS, 0, int(len(dataset.positions[i]) / dataset.vertex_count))
-
-                    glBindVertexArray(0)
+                    if subset is None:
+                        offset, count = buffers.marker_range(i, j)
+                        glDrawElements(GL_POINTS, count, GL_UNSIGNED_INT, offset)
+                    else:
+                        firsts = buffers.class_first[i] + sample_firsts(dataset, i, subset) + j
+                        draw_line_strips(firsts, 1, GL_POINTS)
 
+    glBindVertexArray(0)
     glDisable(GL_BLEND)
 
-def draw_highlighted_nd_points(dataset, class_vao):
+def draw_highlighted_nd_points(dataset, buffers):
     # highlight color and width
     glEnable(GL_BLEND)
     glEnable(GL_LINE_SMOOTH)
@@ -265,81 +498,56 @@ def draw_highlighted_nd_points(dataset, class_vao):
     glColor3ub(255, 255, 0)
     glLineWidth(2)
 
-    # loop through classes in class order
-    for i in dataset.class_order[::-1]:
-        datapoint_cnt = 0
-        # check if active
-        if dataset.active_classes[i]:
-            # positions of the class
-            glBindVertexArray(class_vao[i])
-            size_index = 0
-            for j in range(dataset.class_count):
-                if j < i:
-                    size_index += dataset.count_per_class[j]
-
-            # draw polyline
-            size = len(dataset.positions[i])
-            for j in range(0, size, dataset.vertex_count):
-                if size_index + datapoint_cnt < len(dataset.vertex_in):
-                    if dataset.clear_samples[size_index + datapoint_cnt]:
-                        datapoint_cnt += 1
-                        continue
-                    if dataset.clipped_samples[size_index + datapoint_cnt]:
-                        glDrawArrays(GL_LINE_STRIP, j, dataset.vertex_count)
-                    datapoint_cnt += 1
-            glBindVertexArray(0)
+    highlighted = CLIPPING.sample_mask(dataset, 'clipped_samples') & ~CLIPPING.sample_mask(dataset, 'clear_samples')
+    buffers.highlights.draw(dataset, highlighted, dataset.vertex_count)
 
     glLineWidth(1)
 
-def draw_axes(dataset, axis_vao, color):
-    glBindVertexArray(axis_vao)
-    glColor4f(*color)
+def axis_geometry(dataset):
+    """
+    GL_LINES vertices of the axes and the points drawn with them: the axis segments of the line
+    plots, or the circle of every class, the SCC ticks and the center point of the circular ones.
+    """
+    if dataset.plot_type not in ['SCC', 'DCC']:  # line axes
+        return np.asarray(dataset.axis_positions, dtype=np.float32).reshape(-1, 2), np.zeros((0, 2), dtype=np.float32)
 
-    if dataset.plot_type not in ['SCC', 'DCC']:  # draw a line axis
-        for j in range(0, dataset.axis_count * 2, 2):
-            glDrawArrays(GL_LINES, j, dataset.vertex_count)
-    else:  # draw a circle axis
-        lineSeg = 100
-        angle_between_ticks = 2 * np.pi / dataset.attribute_count
+    lineSeg = 100
+    angles = np.arange(lineSeg + 1) * 2 * np.pi / lineSeg
+    tick_angles = (-np.arange(dataset.attribute_count) * 2 * np.pi / dataset.attribute_count + np.pi / 2) % (2 * np.pi)  # Start from the top and go clockwise
 
-        for class_index in range(dataset.class_count):
-            base_radius = (dataset.attribute_count / (2 * np.pi))
+    lines = []
+    for class_index in range(dataset.class_count):
+        base_radius = (dataset.attribute_count / (2 * np.pi))
 
-            if class_index < 2:
-                # First two classes share the first axis
-                radius_factor = 1
-            else:
-                scale_factor = 2.1
-                radius_factor = scale_factor * (class_index - 1)
+        if class_index < 2:
+            # First two classes share the first axis
+            radius_factor = 1
+        else:
+            scale_factor = 2.1
+            radius_factor = scale_factor * (class_index - 1)
 
-            radius = base_radius * radius_factor
+        radius = base_radius * radius_factor
 
-            # draw center point
-            glBegin(GL_POINTS)
-            glVertex2f(0, 0)
-            glEnd()
+        # axis circle as segments between consecutive points
+        circle = radius * np.column_stack((np.cos(angles), np.sin(angles)))
+        lines.append(np.stack((circle[:-1], circle[1:]), axis=1).reshape(-1, 2))
 
-            # Draw axis circle
-            glBegin(GL_LINE_LOOP)
-            for i in range(lineSeg + 1):
-                glVertex2f(radius * np.cos(i * 2 * np.pi / lineSeg), radius * np.sin(i * 2 * np.pi / lineSeg))
-            glEnd()
+        if dataset.plot_type == 'SCC':
+            # tick marks across the circle
+            tick_length = radius * 2
+            directions = np.column_stack((np.cos(tick_angles), np.sin(tick_angles)))
+            lines.append(np.stack(((radius - tick_length / 2) * directions, (radius + tick_length / 2) * directions), axis=1).reshape(-1, 2))
 
-            if dataset.plot_type == 'SCC':
-                # Draw tick marks
-                tick_length = radius * 2  # Adjust the tick length as needed
-                for i in range(dataset.attribute_count):
-                    angle_for_tick = (-i * angle_between_ticks + np.pi / 2) % (2 * np.pi)  # Start from the top and go clockwise
-                    inner_x = (radius - tick_length / 2) * np.cos(angle_for_tick)
-                    inner_y = (radius - tick_length / 2) * np.sin(angle_for_tick)
-                    outer_x = (radius + tick_length / 2) * np.cos(angle_for_tick)
-                    outer_y = (radius + tick_length / 2) * np.sin(angle_for_tick)
-
-                    glBegin(GL_LINES)
-                    glVertex2f(inner_x, inner_y)
-                    glVertex2f(outer_x, outer_y)
-                    glEnd()
+    lines = np.concatenate(lines) if lines else np.zeros((0, 2))
+    return lines.astype(np.float32), np.zeros((1, 2), dtype=np.float32)
 
+def draw_axes(buffers, color):
+    # every axis line is one draw from the cached geometry, then the center point of circular plots
+    glBindVertexArray(buffers.axis_vao)
+    glColor4f(*color)
+    glDrawArrays(GL_LINES, 0, buffers.axis_count)
+    if buffers.axis_point_count:
+        glDrawArrays(GL_POINTS, buffers.axis_count, buffers.axis_point_count)
     glBindVertexArray(0)
 
 def draw_box(all_rect, color):
@@ -366,35 +574,437 @@ def set_view_frustrum(m_left, m_right, m_bottom, m_top):
     glLoadIdentity()
 
 
+VERTEX_DTYPE = np.dtype([('position', np.float32, 2), ('color', np.uint8, 4)])  # interleaved layout vertex
+
+
+def tone_map(counts, color):
+    # log scale so single lines stay visible next to the densest bundles of the class
+    peak = np.log1p(max(float(counts.max()), 1)) if counts.size else 1
+    rgba = np.empty(counts.shape + (4,), dtype=np.uint8)
+    rgba[..., :3] = np.asarray(color[:3], dtype=np.uint8)
+    rgba[..., 3] = np.round(np.log1p(counts) / peak * 255)
+    return rgba
+
+
+class DensityLayers:
+    """
+    Line density of each class at viewport resolution. The lines of a class are summed with
+    additive blending into an offscreen float target, read back and tone-mapped into one
+    texture per class, so drawing them costs the pixels of the view and not the sample count.
+    """
+    def __init__(self):
+        self.framebuffer = glGenFramebuffers(1)
+        self.counts = glGenTextures(1)  # float accumulation target
+        self.textures = []  # tone-mapped RGBA layer of each drawn class
+        self.size = None
+        self.rect = None  # view the layers were accumulated for, they stretch with it until recomputed
+        self.key = None
+
+        glBindTexture(GL_TEXTURE_2D, self.counts)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+        glBindTexture(GL_TEXTURE_2D, 0)
+
+    def accumulate(self, size, rect, classes, draw_class, default_framebuffer):
+        width, height = size
+        glBindFramebuffer(GL_FRAMEBUFFER, self.framebuffer)
+        if size != self.size:
+            glBindTexture(GL_TEXTURE_2D, self.counts)
+            glTexImage2D(GL_TEXTURE_2D, 0, GL_R32F, width, height, 0, GL_RED, GL_FLOAT, None)
+            glBindTexture(GL_TEXTURE_2D, 0)
+            glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_TEXTURE_2D, self.counts, 0)
+        glViewport(0, 0, width, height)
+
+        # every line adds one to each pixel it covers
+        glDisable(GL_LINE_SMOOTH)
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_ONE, GL_ONE)
+        glLineWidth(1)
+        glColor4f(1, 1, 1, 1)
+        glClearColor(0, 0, 0, 0)
+        glReadBuffer(GL_COLOR_ATTACHMENT0)
+
+        layers = []
+        for class_index, color in classes:
+            glClear(GL_COLOR_BUFFER_BIT)
+            draw_class(class_index)
+            counts = np.asarray(glReadPixels(0, 0, width, height, GL_RED, GL_FLOAT), dtype=np.float32).reshape(height, width)
+            layers.append(tone_map(counts, color))
+
+        glBindFramebuffer(GL_FRAMEBUFFER, default_framebuffer)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        glDisable(GL_BLEND)
+
+        # one texture per layer, kept between recomputes
+        if len(self.textures) < len(layers):
+            new_textures = glGenTextures(len(layers) - len(self.textures))
+            self.textures += list(np.atleast_1d(new_textures))
+        elif len(self.textures) > len(layers):
+            glDeleteTextures(len(self.textures) - len(layers), np.asarray(self.textures[len(layers):], dtype=np.uint32))
+            self.textures = self.textures[:len(layers)]
+        for texture, rgba in zip(self.textures, layers):
+            glBindTexture(GL_TEXTURE_2D, texture)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+            glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA8, width, height, 0, GL_RGBA, GL_UNSIGNED_BYTE, rgba)
+        glBindTexture(GL_TEXTURE_2D, 0)
+
+        self.size = size
+        self.rect = rect
+
+    def draw(self):
+        if self.rect is None:
+            return
+        left, right, bottom, top = self.rect
+        glEnable(GL_TEXTURE_2D)
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        glColor4f(1, 1, 1, 1)
+        for texture in self.textures:
+            glBindTexture(GL_TEXTURE_2D, texture)
+            glBegin(GL_QUADS)
+            glTexCoord2f(0, 0)
+            glVertex2f(left, bottom)
+            glTexCoord2f(1, 0)
+            glVertex2f(right, bottom)
+            glTexCoord2f(1, 1)
+            glVertex2f(right, top)
+            glTexCoord2f(0, 1)
+            glVertex2f(left, top)
+            glEnd()
+        glBindTexture(GL_TEXTURE_2D, 0)
+        glDisable(GL_BLEND)
+        glDisable(GL_TEXTURE_2D)
+
+    def delete(self):
+        glDeleteFramebuffers(1, np.array([self.framebuffer], dtype=np.uint32))
+        glDeleteTextures(len(self.textures) + 1, np.asarray([self.counts] + self.textures, dtype=np.uint32))
+
+
+class HighlightIndices:
+    """
+    Element buffer of the highlighted line strips of a vertex array whose strips are stored in
+    sample order. The indices are rebuilt only when the selection changes, each paint is one draw.
+    """
+    def __init__(self, vao):
+        self.vao = vao
+        self.buffer = glGenBuffers(1)
+        self.count = 0
+        self.key = None  # selected samples the indices were built from
+
+        glBindVertexArray(self.vao)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.buffer)
+        glBindVertexArray(0)
+
+    def update(self, dataset, mask, stride):
+        active = np.repeat(np.asarray(dataset.active_classes, dtype=bool), np.diff(sample_offsets(dataset)))
+        selected = mask & active
+        key = (selected.tobytes(), stride)
+        if key == self.key:
+            return
+
+        indices = strip_segment_indices(np.flatnonzero(selected) * stride, stride)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.buffer)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices if indices.nbytes else None, GL_DYNAMIC_DRAW)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+        self.count = len(indices)
+        self.key = key
+
+    def draw(self, dataset, mask, stride):
+        self.update(dataset, mask, stride)
+        if self.count:
+            glBindVertexArray(self.vao)
+            glDrawElements(GL_LINES, self.count, GL_UNSIGNED_INT, None)
+            glBindVertexArray(0)
+
+    def delete(self):
+        glDeleteBuffers(1, np.array([self.buffer], dtype=np.uint32))
+
+
+def timer_queries_supported():
+    # GL_TIME_ELAPSED is core from GL 3.3, older contexts need ARB_timer_query
+    version = glGetString(GL_VERSION) or b''
+    try:
+        major, minor = (int(part) for part in version.split()[0].split(b'.')[:2])
+    except (ValueError, IndexError):
+        major, minor = 0, 0
+    return (major, minor) >= (3, 3) or extensions.hasGLExtension('GL_ARB_timer_query')
+
+
+class FrameTimer:
+    """
+    GPU time of a paint from a GL_TIME_ELAPSED query. The result is read at the start of a later
+    paint once the GPU has it, so the timing never stalls a frame, and frames are skipped meanwhile.
+    Without timer queries begin() returns None and the budget follows the CPU time alone.
+    """
+    def __init__(self):
+        self.query = int(glGenQueries(1)[0]) if timer_queries_supported() else None
+        self.drawn = None  # samples drawn by the paint the query is timing
+        self.running = False
+
+    def begin(self):
+        """Seconds and drawn samples of the last timed paint, or None, and start timing this paint when the query is free."""
+        if self.query is None:
+            return None
+        result = None
+        if self.drawn is not None:
+            if not glGetQueryObjectiv(self.query, GL_QUERY_RESULT_AVAILABLE):
+                return None
+            elapsed = glGetQueryObjectuiv(self.query, GL_QUERY_RESULT) / 1e9
+            if elapsed < 1:  # some drivers report a saturated first result
+                result = (elapsed, self.drawn)
+            self.drawn = None
+        glBeginQuery(GL_TIME_ELAPSED, self.query)
+        self.running = True
+        return result
+
+    def end(self, drawn):
+        if self.running:
+            glEndQuery(GL_TIME_ELAPSED)
+            self.drawn, self.running = drawn, False
+
+    def delete(self):
+        if self.query is not None:
+            glDeleteQueries(1, np.array([self.query], dtype=np.uint32))
+
+
+class LayoutBuffers:
+    """
+    GL buffers of the plot layouts, deleted only through delete(). The vertices of every
+    class share one interleaved position and color buffer, markers draw from it through
+    ranges of an index buffer, and each allocation is reused while new data still fits.
+    """
+    def __init__(self):
+        self.vertex_buffer, self.index_buffer, self.axis_buffer = glGenBuffers(3)
+        self.capacity = {int(self.vertex_buffer): 0, int(self.index_buffer): 0, int(self.axis_buffer): 0}
+
+        self.vertices = np.zeros(0, dtype=VERTEX_DTYPE)
+        self.layout = None  # vertices of each class and of each sample the buffers hold
+        self.class_first = np.zeros(1, dtype=np.int32)  # first vertex of each class, then the vertex total
+        self.vertex_count = 0
+        self.axis_count = 0  # axis line vertices, followed by the axis points
+        self.axis_point_count = 0
+        self.axis_key = None  # what the axis geometry was generated for
+
+        stride = VERTEX_DTYPE.itemsize
+        self.line_vao = glGenVertexArrays(1)  # positions only, with the marker indices
+        glBindVertexArray(self.line_vao)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vertex_buffer)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glVertexPointer(2, GL_FLOAT, stride, None)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.index_buffer)
+        glBindVertexArray(0)
+
+        self.shaded_vao = glGenVertexArrays(1)  # positions and per-vertex colors
+        glBindVertexArray(self.shaded_vao)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vertex_buffer)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glVertexPointer(2, GL_FLOAT, stride, None)
+        glEnableClientState(GL_COLOR_ARRAY)
+        glColorPointer(4, GL_UNSIGNED_BYTE, stride, ctypes.c_void_p(VERTEX_DTYPE.fields['color'][1]))
+        glBindVertexArray(0)
+
+        self.highlight_vao = glGenVertexArrays(1)  # positions only, with the highlighted segment indices
+        glBindVertexArray(self.highlight_vao)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vertex_buffer)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glVertexPointer(2, GL_FLOAT, stride, None)
+        glBindVertexArray(0)
+        self.highlights = HighlightIndices(self.highlight_vao)
+
+        self.axis_vao = glGenVertexArrays(1)
+        glBindVertexArray(self.axis_vao)
+        glBindBuffer(GL_ARRAY_BUFFER, self.axis_buffer)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glVertexPointer(2, GL_FLOAT, 0, None)
+        glBindVertexArray(0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def write(self, target, buffer, data, offset=0):
+        # grow the allocation only when the data does not fit, otherwise update it in place
+        data = np.ascontiguousarray(data).view(np.uint8).ravel()
+        glBindBuffer(target, buffer)
+        capacity = self.capacity[int(buffer)]
+        if offset + data.nbytes > capacity:
+            if offset:
+                # the grown store keeps the bytes before offset, any gap past the old store is zeroed
+                kept = np.asarray(glGetBufferSubData(target, 0, min(offset, capacity)), dtype=np.uint8) if capacity else np.zeros(0, dtype=np.uint8)
+                data = np.concatenate((kept, np.zeros(offset - len(kept), dtype=np.uint8), data))
+            glBufferData(target, data.nbytes, data if data.nbytes else None, GL_DYNAMIC_DRAW)
+            self.capacity[int(buffer)] = data.nbytes
+        elif data.nbytes:
+            glBufferSubData(target, offset, data.nbytes, data)
+        glBindBuffer(target, 0)
+
+    def set_positions(self, positions, vertex_count):
+        class_sizes = tuple(len(class_positions) for class_positions in positions)
+        new_positions = np.concatenate([np.asarray(class_positions, dtype=np.float32).reshape(-1, 2) for class_positions in positions]) if positions else np.zeros((0, 2), dtype=np.float32)
+
+        if (class_sizes, vertex_count) == self.layout:
+            # same layout, only the span of vertices that moved is written
+            changed = np.flatnonzero(np.any(self.vertices['position'] != new_positions, axis=1))
+            if len(changed):
+                first, last = changed[0], changed[-1] + 1
+                self.vertices['position'][first:last] = new_positions[first:last]
+                self.write(GL_ARRAY_BUFFER, self.vertex_buffer, self.vertices[first:last], first * VERTEX_DTYPE.itemsize)
+        else:
+            self.layout = (class_sizes, vertex_count)
+            self.vertex_count = vertex_count
+            self.vertices = np.zeros(len(new_positions), dtype=VERTEX_DTYPE)
+            self.vertices['position'] = new_positions
+            self.class_first = np.concatenate(([0], np.cumsum(class_sizes))).astype(np.int32)
+            self.write(GL_ARRAY_BUFFER, self.vertex_buffer, self.vertices)
+            self.highlights.key = None
+
+            # vertex j of every sample of a class is one contiguous range of indices
+            indices = [first + (np.arange(max(vertex_count, 1))[:, None] + np.arange(size // max(vertex_count, 1))[None, :] * vertex_count).ravel()
+                       for first, size in zip(self.class_first, class_sizes)]
+            self.write(GL_ELEMENT_ARRAY_BUFFER, self.index_buffer, np.concatenate(indices).astype(np.uint32) if indices else np.zeros(0, dtype=np.uint32))
+
+    def set_axes(self, dataset):
+        # circles and ticks change only with the plot type, attribute and class counts, line axes with their positions
+        if dataset.plot_type in ['SCC', 'DCC']:
+            key = (dataset.plot_type, dataset.attribute_count, dataset.class_count)
+        else:
+            key = (dataset.plot_type, np.asarray(dataset.axis_positions, dtype=np.float32).tobytes())
+        if key == self.axis_key:
+            return
+
+        lines, points = axis_geometry(dataset)
+        self.write(GL_ARRAY_BUFFER, self.axis_buffer, np.concatenate((lines, points)))
+        self.axis_count, self.axis_point_count = len(lines), len(points)
+        self.axis_key = key
+
+    def set_colors(self, colors):
+        self.vertices['color'] = np.concatenate(colors) if colors else np.zeros((0, 4), dtype=np.uint8)
+        self.write(GL_ARRAY_BUFFER, self.vertex_buffer, self.vertices)
+
+    def set_alpha(self, vertex_alpha):
+        # only the alpha channel changes, the RGB of every vertex is kept
+        self.vertices['color'][:, 3] = np.tile(vertex_alpha, len(self.vertices) // max(len(vertex_alpha), 1))
+        self.write(GL_ARRAY_BUFFER, self.vertex_buffer, self.vertices)
+
+    def marker_range(self, class_index, vertex_index):
+        # byte offset into the index buffer and marker count of vertex vertex_index of a class
+        sample_count = (self.class_first[class_index + 1] - self.class_first[class_index]) // max(self.vertex_count, 1)
+        return ctypes.c_void_p(int(self.class_first[class_index] + vertex_index * sample_count) * 4), int(sample_count)
+
+    def delete(self):
+        self.highlights.delete()
+        glDeleteVertexArrays(4, np.array([self.line_vao, self.shaded_vao, self.highlight_vao, self.axis_vao], dtype=np.uint32))
+        glDeleteBuffers(3, np.array([self.vertex_buffer, self.index_buffer, self.axis_buffer], dtype=np.uint32))
+
+
+class LayoutWorker(QThread):
+    """Lays out and analyzes a detached copy of the dataset off the GUI thread, a stale job stops at its next stage."""
+    progress = pyqtSignal(int)
+    done = pyqtSignal(int, object, object, object)  # generation, laid out copy, the dataset fields it was taken from and its circular_overlaps
+    failed = pyqtSignal(int, str)  # generation and the error
+
+    def __init__(self, generation, dataset, plot_type, in_place=False, parent=None):
+        super().__init__(parent)
+        self.generation = generation
+        self.in_place = in_place  # move only the edited vertices when GCA.relayout can
+        self.snapshot = dict(vars(dataset))
+        self.layout = GCA.detach(dataset, plot_type, in_place)
+
+    def report(self, percent):
+        if self.isInterruptionRequested():
+            raise GCA.LayoutCancelled()
+        self.progress.emit(percent)
+
+    def run(self):
+        try:
+            self.report(0)
+            if not (self.in_place and GCA.relayout(self.layout)):
+                GCA.GCA(self.layout, lambda percent: self.report(10 + percent * 7 // 10))
+            # sectors and overlaps of circular layouts are swapped in with the positions
+            overlaps = circular_overlaps(self.layout) if self.layout.plot_type in ['SCC', 'DCC'] else None
+            self.report(100)
+        except GCA.LayoutCancelled:
+            return
+        except Exception as e:
+            if not self.isInterruptionRequested():
+                self.failed.emit(self.generation, str(e))
+            return
+        if not self.isInterruptionRequested():
+            self.done.emit(self.generation, self.layout, self.snapshot, overlaps)
+
+
 class Plot(QOpenGLWidget):
-    def __init__(self, dataset, replot_overlaps_box, overlaps_textbox, replot_overlaps_btn, parent=None, reset_zoom=None):
+    layout_progress = pyqtSignal(int)  # percent of the background layout
+    layout_finished = pyqtSignal()  # a background layout was swapped in
+    edit_finished = pyqtSignal()  # the layout of an edit was swapped in, the tables stay
+    layout_failed = pyqtSignal(str)  # error of the background layout
+
+    def __init__(self, dataset, replot_overlaps_box, overlap_stats, parent=None, reset_zoom=None):
         super(Plot, self).__init__(parent)
 
         self.data = dataset
         
-        self.vertex_info = GCA.GCA(self.data)
-        self.line_vao = []
-        self.marker_vao = []
-        self.axis_vao = None
+        # layouts run in LayoutWorker threads, nothing is drawn before the first one is swapped in
+        self.layout_ready = False
+        self.layout_generation = 0
+        self.layout_workers = []
+        self.pending_plot_type = None  # plot type of the layout being computed
+        self.pending_reset_view = True
+        self.pending_new_plot = True  # False while only an edit of the drawn plot is pending
+        self.pending_in_place = False
+        self.buffers = None  # LayoutBuffers, made with the GL context
+        self.line_colors_key = None  # state the uploaded colors were built from
+        self.line_alpha_key = None
+        self.curve_vao = []  # tessellated SCC/DCC curves with per-vertex colors
+        self.curve_vbos = []  # (curve, color) buffers of each class
+        self.curve_highlight_vbo = None  # highlighted curves of every class, in sample order
+        self.curve_highlights = None  # HighlightIndices into them
+        self.curve_colors = []
+        self.curve_order_key = None
+        self.curve_colors_key = None
+        self.curve_alpha_key = None
+        self.class_sectors = []  # closest and furthest curve end of each class, or None
+        self.sectors_dirty = True  # set by the edits the sectors and overlaps depend on
+        self.sectors_edits = 0  # count of those edits, overlaps of a layout started before one are recomputed
+        self.pending_sectors_edits = 0
+        self.curve_marker_vao = []  # SCC/DCC markers, stored vertex by vertex
+        self.overlap_marker_vao = []  # markers inside more than one sector
+        self.curve_marker_vbos = []  # (marker, overlapping marker) buffers of each class
+        self.overlap_markers = []  # markers inside more than one sector of each class, vertex by vertex
+        self.overlap_marker_ranges = []  # (firsts, counts) of the overlapping markers of each vertex
+        self.density = None  # DensityLayers of the density mode, made with the GL context
+
+        # the density layers are recomputed once the view stops moving
+        self.view_settled = True
+        self.settle_timer = QTimer(self)
+        self.settle_timer.setSingleShot(True)
+        self.settle_timer.setInterval(200)
+        self.settle_timer.timeout.connect(self.settle_view)
+
+        # while the view moves a stratified subset is drawn, sized to keep frames near the target
+        self.frame_time_target = 1 / 30
+        self.frame_timer = None  # FrameTimer of the GPU time, made with the GL context
+        self.sample_cost = None  # seconds per drawn sample, averaged over the recent frames
+        self.lod_budget = None  # samples that fit the target at that cost
+        self.lod_mask = None
+        self.lod_mask_key = None  # budget and class sizes the mask was built for
+
+        # once the view settles the subset grows over idle frames until every sample is drawn
+        self.refine_budget = None  # samples of the next refinement frame, None draws every sample
+        self.refine_timer = QTimer(self)
+        self.refine_timer.setSingleShot(True)
+        self.refine_timer.setInterval(0)
+        self.refine_timer.timeout.connect(self.update)
 
         self.sectors = []
-        self.data.active_sectors = [True for _ in range(self.data.class_count)]
-        self.replot_overlaps_btn = replot_overlaps_btn
-        self.replot_overlaps_btn.setEnabled(False)
-        
-        # for clipping
-        self.all_rect = []  # holds all clip boxes
-        self.rect = []  # working clip box
+        self.buffer_layout = None  # plot type, class count and vertex count the buffers were made for
+        self.replot_overlaps_box = replot_overlaps_box
+        self.overlap_stats = overlap_stats  # OverlapStatistics shown by the view
+        self.overlap_stats.reset()
         self.attribute_inversions: List[bool] = []  # for attribute inversion option
 
-        self.overlaps_textbox = overlaps_textbox
-        
-        self.overlaps_textbox.setText('Requires Circular Coordinates\n\nSelect SCC or DCC to view overlaps.')
-        
-        if not reset_zoom:
-            self.reset_zoom()
-            self.resize()
-        else:
+        self.reset_plot_state(reset_view=not reset_zoom)
+        if reset_zoom:
             self.m_left = reset_zoom[0]
             self.m_right = reset_zoom[1]
             self.m_bottom = reset_zoom[2]
@@ -413,14 +1023,28 @@ class Plot(QOpenGLWidget):
         self.background_color = [239 / 255, 239 / 255, 239 / 255, 1]  # Default gray in RGBA
         self.axes_color = [0, 0, 0, 0]  # Default black
 
+    def reset_plot_state(self, reset_view=True):
+        # per-layout state, set for a new plot and again after update_data
+        self.data.active_sectors = [True for _ in range(self.data.class_count)]
+        if self.data.plot_type not in ['SCC', 'DCC']:
+            self.overlap_stats.reset()  # circular layouts publish their counts from update_sectors
+
+        # for clipping
+        self.all_rect = []  # holds all clip boxes
+        self.rect = []  # working clip box
+
+        if reset_view:
+            self.reset_zoom()
+            self.resize()
+
         self.highlight_overlaps = self.data.plot_type in ['SCC', 'DCC']
-        replot_overlaps_box.setChecked(self.highlight_overlaps)
+        self.replot_overlaps_box.setChecked(self.highlight_overlaps)
         if self.highlight_overlaps:
-            replot_overlaps_box.setEnabled(True)   
+            self.replot_overlaps_box.setEnabled(True)
         else:
-            replot_overlaps_box.setEnabled(False)
+            self.replot_overlaps_box.setEnabled(False)
             self.highlight_overlaps = True
-        
+
     def reset_zoom(self):
         self.m_left = -1.125
         self.m_right = 1.125
@@ -431,6 +1055,8 @@ class Plot(QOpenGLWidget):
         return self.m_left, self.m_right, self.m_bottom, self.m_top
 
     def set_zoom(self, m_left, m_right, m_bottom, m_top):
+        # an explicit view is kept by the layout being computed
+        self.pending_reset_view = False
         self.m_left = m_left
         self.m_right = m_right
         self.m_bottom = m_bottom
@@ -464,42 +1090,311 @@ class Plot(QOpenGLWidget):
         glEnable(GL_PROGRAM_POINT_SIZE)
         glPointSize(5)
         QApplication.instance().restoreOverrideCursor()
-        # push dataset to GPU memory
-        for i in range(self.data.class_count):
-            positions = np.asarray(self.data.positions[i], dtype='float32')
-            # put them into a VBO
-            vbo = glvbo.VBO(positions)
-            vbo.bind()
-            # reference the VBO
-            vao = glGenVertexArrays(1)
-            self.line_vao.append(vao)
-            # push class to GPU memory
-            glBindVertexArray(self.line_vao[i])
-            glEnableClientState(GL_VERTEX_ARRAY)
-            glVertexPointer(2, GL_FLOAT, 0, None)
-            glBindVertexArray(0)
+        # the buffers live as long as the context, released before it is destroyed
+        self.buffers = LayoutBuffers()
+        self.density = DensityLayers()
+        self.frame_timer = FrameTimer()
+        self.context().aboutToBeDestroyed.connect(self.release_buffers)
+        if self.layout_ready:
+            self.create_buffers()
+
+    def create_buffers(self):
+        self.buffer_layout = (self.data.plot_type, self.data.class_count, self.data.vertex_count)
+        # push dataset to GPU memory, reusing the allocations of the previous layout
+        self.buffers.set_positions(self.data.positions, self.data.vertex_count)
+        self.buffers.set_axes(self.data)
+
+        if self.data.plot_type in ['SCC', 'DCC']:
+            for i in range(self.data.class_count):
+                # tessellated curves, rebuilt by update_sectors when the class order changes
+                curve_vbo = glvbo.VBO(curve_strips(self.data, i))
+                curve_color_vbo = glvbo.VBO(np.zeros((len(curve_vbo.data), 4), dtype=np.uint8))
+                self.curve_vbos.append((curve_vbo, curve_color_vbo))
+                self.curve_vao.append(make_vertex_array(curve_vbo, curve_color_vbo))
+
+                # markers vertex by vertex, and the markers inside several sectors
+                marker_vbo = glvbo.VBO(marker_positions(self.data, i).transpose(1, 0, 2).reshape(-1, 2).astype(np.float32))
+                overlap_vbo = glvbo.VBO(np.zeros((1, 2), dtype=np.float32))
+                self.curve_marker_vbos.append((marker_vbo, overlap_vbo))
+                self.curve_marker_vao.append(make_vertex_array(marker_vbo))
+                self.overlap_marker_vao.append(make_vertex_array(overlap_vbo))
+
+            self.curve_highlight_vbo = glvbo.VBO(highlight_strips(self.data))
+            self.curve_highlights = HighlightIndices(make_vertex_array(self.curve_highlight_vbo))
+            self.curve_order_key = tuple(self.data.class_order)
+            if len(self.overlap_markers) == self.data.class_count:
+                self.upload_overlap_markers()
+
+    def delete_buffers(self):
+        # release the curve buffers and vertex arrays of the current layout
+        for vbo in [vbo for vbos in self.curve_vbos + self.curve_marker_vbos for vbo in vbos]:
+            vbo.delete()
+        vaos = self.curve_vao + self.curve_marker_vao + self.overlap_marker_vao
+        if self.curve_highlights is not None:
+            self.curve_highlight_vbo.delete()
+            self.curve_highlights.delete()
+            vaos.append(self.curve_highlights.vao)
+        if vaos:
+            glDeleteVertexArrays(len(vaos), np.asarray(vaos, dtype=np.uint32))
+
+        self.curve_vao, self.curve_vbos = [], []
+        self.curve_highlight_vbo, self.curve_highlights = None, None
+        self.curve_marker_vao, self.overlap_marker_vao, self.curve_marker_vbos = [], [], []
+
+    def release_buffers(self):
+        if self.buffers is None:
+            return
+        self.makeCurrent()
+        self.delete_buffers()
+        self.buffers.delete()
+        self.density.delete()
+        self.frame_timer.delete()
+        self.buffers, self.density, self.frame_timer = None, None, None
+        self.doneCurrent()
+
+    def update_data(self, reset_view=False):
+        """Lay out the edited dataset again in the worker, keeping this widget and its GL context, and upload only what changed."""
+        # the edit replaces any background layout, keeping the plot type it was for
+        self.request_layout(self.pending_plot_type or self.data.plot_type, reset_view, edit=True)
+
+    def request_layout(self, plot_type, reset_view=True, edit=False, in_place=False):
+        """
+        Lay out the dataset for plot_type in a worker thread, the current layout stays drawn until the new one is swapped in.
+        An edit of the drawn plot keeps the tables, an in_place one also keeps the clip boxes and moves only the edited vertices.
+        """
+        # a superseded request keeps what it asked for
+        pending = self.pending_plot_type is not None
+        new_plot = not edit or (pending and self.pending_new_plot)
+        reset_view = reset_view or (pending and self.pending_reset_view)
+        in_place = in_place and not new_plot and not (pending and not self.pending_in_place)
+
+        self.cancel_layout()
+        # a drawn layout stays until the swap while it still has a vertex run for every sample
+        self.layout_ready = self.layout_ready and (self.data.features is not None or sample_offsets(self.data)[-1] == self.data.sample_count)
+        self.layout_generation += 1
+        self.pending_plot_type = plot_type
+        self.pending_reset_view = reset_view
+        self.pending_new_plot = new_plot
+        self.pending_in_place = in_place and self.layout_ready and self.data.features is not None and plot_type == self.data.plot_type
+        self.pending_sectors_edits = self.sectors_edits
+
+        worker = LayoutWorker(self.layout_generation, self.data, plot_type, self.pending_in_place, self)
+        worker.progress.connect(self.layout_progress)
+        worker.done.connect(self.finish_layout)
+        worker.failed.connect(self.fail_layout)
+        worker.finished.connect(lambda: self.layout_workers.remove(worker))
+        self.layout_workers.append(worker)
+        worker.start()
+
+    def cancel_layout(self):
+        # results already queued by a worker carry the old generation and are dropped
+        for worker in self.layout_workers:
+            worker.requestInterruption()
+        self.layout_generation += 1
+        self.pending_plot_type = None
+
+    def finish_layout(self, generation, layout, snapshot, overlaps):
+        # runs on the GUI thread, results of cancelled or superseded jobs are dropped
+        if generation != self.layout_generation or self.pending_plot_type is None:
+            return
+        GCA.swap_layout(self.data, layout, snapshot)
+        self.pending_plot_type = None
+        self.apply_layout(self.pending_reset_view, overlaps if self.sectors_edits == self.pending_sectors_edits else None, self.pending_in_place)
+        if self.pending_new_plot:
+            self.layout_finished.emit()
+        else:
+            self.edit_finished.emit()
 
-            for j in range(self.data.vertex_count):
-                m_vao = glGenVertexArrays(1)
-                self.marker_vao.append(m_vao)
-                glBindVertexArray(self.marker_vao[i * self.data.vertex_count + j])
-                glEnableClientState(GL_VERTEX_ARRAY)
-                offset = ctypes.c_void_p(j * 8)
-                glVertexPointer(2, GL_FLOAT, self.data.vertex_count * 8, offset)
-                # unbind
-                glBindVertexArray(0)
+    def fail_layout(self, generation, message):
+        if generation != self.layout_generation or self.pending_plot_type is None:
+            return
+        # the current layout stays drawn and can be edited again
+        self.pending_plot_type = None
+        self.layout_failed.emit(message)
+
+    def apply_layout(self, reset_view, overlaps=None, keep_state=False):
+        # upload a new layout of the dataset and rebuild what depends on it on the next paint
+        first_layout = not self.layout_ready
+        self.layout_ready = True
+        if not keep_state:
+            self.reset_plot_state(reset_view)
+
+        if self.buffers is not None:
+            self.makeCurrent()
+            if first_layout or self.buffer_layout != (self.data.plot_type, self.data.class_count, self.data.vertex_count):
+                self.delete_buffers()
+                self.create_buffers()
+            else:
+                self.buffers.set_positions(self.data.positions, self.data.vertex_count)
+                self.buffers.set_axes(self.data)
+                self.curve_order_key = None  # the kept curves follow the new positions
+            self.doneCurrent()
+
+        # colors are rebuilt from the new layout on the next paint, sectors and overlaps right away unless the worker computed them
+        self.line_colors_key = None
+        self.curve_colors_key = None
+        self.curve_alpha_key = None
+        if self.density is not None:
+            self.density.key = None
+        if overlaps is not None:
+            self.set_sectors(overlaps)
+        else:
+            self.sectors_dirty = True
+            self.update_sectors()
+        self.update()
 
-        # push the axis vertices to GPU
-        axis = np.asarray(self.data.axis_positions, dtype='float32')
-        axis_vbo = glvbo.VBO(axis)
-        axis_vbo.bind()
-        # reference
-        self.axis_vao = glGenVertexArrays(1)
-        # push
-        glBindVertexArray(self.axis_vao)
-        glEnableClientState(GL_VERTEX_ARRAY)
-        glVertexPointer(2, GL_FLOAT, 0, None)
+    def relayout(self):
+        """Move the vertices of edited attributes in the worker, a full layout when they cannot move in place, False when no layout is drawn."""
+        if not self.layout_ready:
+            return False
+        self.request_layout(self.pending_plot_type or self.data.plot_type, reset_view=False, edit=True, in_place=True)
+        return True
+
+    def update_line_colors(self):
+        # rebuild the per-vertex colors only when the state they come from changed, the slider only rewrites alpha
+        key = polyline_colors_key(self.data)
+        alpha_key = polyline_alpha_key(self.data)
+        if key != self.line_colors_key:
+            self.buffers.set_colors(polyline_colors(self.data))
+        elif alpha_key != self.line_alpha_key:
+            self.buffers.set_alpha(polyline_alpha(self.data))
+        self.line_colors_key = key
+        self.line_alpha_key = alpha_key
+
+    def invalidate_sectors(self):
+        """The clear samples, class order or active classes and markers changed, the sectors and overlaps follow them now."""
+        self.sectors_dirty = True
+        self.sectors_edits += 1
+        self.update_sectors()
+        self.update()
+
+    def update_sectors(self):
+        # recomputed where their inputs change, so paintGL only draws the cached sectors and markers
+        if not self.sectors_dirty or not self.layout_ready or self.data.plot_type not in ['SCC', 'DCC']:
+            return
+        self.set_sectors(circular_overlaps(self.data))
+
+    def set_sectors(self, overlaps):
+        # keep the circular_overlaps of the layout, upload its markers and publish its counts
+        self.class_sectors, self.sectors, self.overlap_markers, self.overlap_marker_ranges = overlaps
+        self.sectors_dirty = False
+        self.overlap_stats.update(self.data)
+
+        if self.buffers is not None and self.curve_vbos:
+            self.makeCurrent()
+            if tuple(self.data.class_order) != self.curve_order_key:
+                self.upload_curves()
+            self.upload_overlap_markers()
+            self.doneCurrent()
+
+    def upload_curves(self):
+        # curves bend by class order, so they are re-tessellated when it or the positions change
+        for i, (curve_vbo, _) in enumerate(self.curve_vbos):
+            curve_vbo.set_array(curve_strips(self.data, i))
+            curve_vbo.bind()
+            curve_vbo.unbind()
+        self.curve_highlight_vbo.set_array(highlight_strips(self.data))
+        self.curve_highlight_vbo.bind()
+        self.curve_highlight_vbo.unbind()
+        for i, (marker_vbo, _) in enumerate(self.curve_marker_vbos):
+            marker_vbo.set_array(marker_positions(self.data, i).transpose(1, 0, 2).reshape(-1, 2).astype(np.float32))
+            marker_vbo.bind()
+            marker_vbo.unbind()
+        self.curve_order_key = tuple(self.data.class_order)
+
+    def upload_overlap_markers(self):
+        for (_, overlap_vbo), markers in zip(self.curve_marker_vbos, self.overlap_markers):
+            overlap_vbo.set_array(markers)
+            overlap_vbo.bind()
+            overlap_vbo.unbind()
+
+    def update_curve_colors(self):
+        colors_key = curve_colors_key(self.data)
+        alpha_key = curve_alpha_key(self.data)
+        if colors_key != self.curve_colors_key or alpha_key != self.curve_alpha_key:
+            if colors_key != self.curve_colors_key:
+                self.curve_colors = curve_colors(self.data)
+            else:
+                # the slider only rewrites the alpha channel of the kept colors
+                alpha = curve_alpha(self.data)
+                for colors in self.curve_colors:
+                    colors[:, 3] = np.tile(alpha, len(colors) // max(len(alpha), 1))
+            for (_, color_vbo), colors in zip(self.curve_vbos, self.curve_colors):
+                color_vbo.set_array(colors)
+                color_vbo.bind()
+                color_vbo.unbind()
+            self.curve_colors_key = colors_key
+            self.curve_alpha_key = alpha_key
+
+    def view_moved(self):
+        # pan and zoom stretch the last density layers until the view settles, a refinement in progress stops
+        self.view_settled = False
+        self.refine_timer.stop()
+        self.settle_timer.start()
+
+    def settle_view(self):
+        # refine to every sample once the view is still, starting from the subset drawn while it moved
+        self.view_settled = True
+        self.refine_budget = self.lod_budget
+        self.refine_view()
+        self.update()
 
+    def refine_view(self):
+        # the next refinement frame is painted once the events queued meanwhile are handled
+        if self.refine_budget is None:
+            return
+        budget = self.refine_budget * REFINE_STEP
+        self.refine_budget = budget if budget < self.data.sample_count else None
+        self.refine_timer.start()
+
+    def lod_subset(self):
+        budget = self.refine_budget if self.view_settled else self.lod_budget
+        if budget is None or budget >= self.data.sample_count:
+            return None
+        # the budget moves in coarse steps, so the mask is rebuilt only when the frame cost really changes
+        key = (budget, tuple(np.diff(sample_offsets(self.data))))
+        if key != self.lod_mask_key:
+            self.lod_mask, self.lod_mask_key = stratified_subset(self.data, budget), key
+        return self.lod_mask
+
+    def update_lod_budget(self, elapsed, drawn, gpu_time=None):
+        """Average the cost of a sample over the frames, the slower of the CPU side and the GPU side of the paint."""
+        if elapsed <= 0 or not drawn:
+            return
+        cost = elapsed / drawn
+        if gpu_time is not None:
+            cost = max(cost, gpu_time[0] / max(gpu_time[1], 1))
+        self.sample_cost = cost if self.sample_cost is None else 0.8 * self.sample_cost + 0.2 * cost
+        # quarter-octave steps, the budget stays until the average cost leaves its step
+        octaves = np.log2(self.frame_time_target / self.sample_cost)
+        if self.lod_budget is None or abs(octaves - np.log2(self.lod_budget)) > 0.25:
+            self.lod_budget = max(int(2 ** (np.round(octaves * 4) / 4)), LOD_MIN_SAMPLES)
+
+    def draw_density(self, draw_class):
+        """Density layers of the visible lines of every active class, recomputed when the view or the lines change."""
+        data = self.data
+        visible = ~CLIPPING.sample_mask(data, 'clear_samples')
+        key = (self.get_zoom(), (self.width, self.height), visible.tobytes(), np.asarray(data.active_classes, dtype=bool).tobytes(),
+               tuple(data.class_order), tuple(tuple(int(v) for v in color) for color in data.class_colors))
+        if key != self.density.key and (self.view_settled or self.density.rect is None):
+            classes = [(i, data.class_colors[i]) for i in data.class_order[::-1] if data.active_classes[i]]
+            self.density.accumulate((self.width, self.height), self.get_zoom(), classes, lambda i: draw_class(i, visible), self.defaultFramebufferObject())
+            glViewport(0, 0, self.width, self.height)
+            self.density.key = key
+        self.density.draw()
+
+    def draw_line_density(self, class_index, visible):
+        glBindVertexArray(self.buffers.line_vao)
+        draw_line_strips(self.buffers.class_first[class_index] + sample_firsts(self.data, class_index, visible), self.data.vertex_count)
+        glBindVertexArray(0)
+
+    def draw_curve_density(self, class_index, visible):
+        # the curve colors are left out, every line adds the same amount
+        strip_length = curve_strip_length(self.data.vertex_count)
+        glBindVertexArray(self.curve_vao[class_index])
+        glDisableClientState(GL_COLOR_ARRAY)
+        draw_line_strips(sample_firsts(self.data, class_index, visible, strip_length), strip_length)
+        glEnableClientState(GL_COLOR_ARRAY)
         glBindVertexArray(0)
 
     def resizeGL(self, width, height):
@@ -507,23 +1402,37 @@ class Plot(QOpenGLWidget):
         glViewport(0, 0, width, height)
 
     def paintGL(self):
+        start = time.perf_counter()
+        subset = self.lod_subset()
+
         glClearColor(*self.background_color)
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        if not self.layout_ready:
+            return
+        gpu_time = self.frame_timer.begin()
         set_view_frustrum(self.m_left, self.m_right, self.m_bottom, self.m_top)
 
         # draw axes
         if self.data.axis_on:
-            draw_axes(self.data, self.axis_vao, self.axes_color)
+            draw_axes(self.buffers, self.axes_color)
 
         # draw n-D points
         if self.data.plot_type in ['SCC', 'DCC']:  # Bezier curves
-            self.draw_unhighlighted_curves(self.data, self.line_vao)
-            draw_highlighted_curves(self.data, self.line_vao)
-            self.draw_unhighlighted_curves_vertices(self.data, self.marker_vao)
+            self.update_curve_colors()
+            if self.data.density_mode:
+                self.draw_density(self.draw_curve_density)
+            else:
+                self.draw_unhighlighted_curves(self.data, self.curve_vao, subset)
+            draw_highlighted_curves(self.data, self.curve_highlights)
+            self.draw_unhighlighted_curves_vertices(self.data, self.curve_marker_vao, subset)
         else:  # Polylines
-            draw_unhighlighted_nd_points(self.data, self.line_vao)
-            draw_highlighted_nd_points(self.data, self.line_vao)
-            draw_unhighlighted_nd_point_vertices(self.data, self.marker_vao)
+            if self.data.density_mode:
+                self.draw_density(self.draw_line_density)
+            else:
+                self.update_line_colors()
+                draw_unhighlighted_nd_points(self.data, self.buffers, subset)
+            draw_highlighted_nd_points(self.data, self.buffers)
+            draw_unhighlighted_nd_point_vertices(self.data, self.buffers, subset)
         
         draw_box(self.all_rect, [1.0, 0.0, 0.0, 0.5])
         
@@ -553,46 +1462,50 @@ class Plot(QOpenGLWidget):
                 else:
                     draw_box(box, [1.0, 0.0, 0.0, 1/3])
 
+        drawn = self.data.sample_count if subset is None else np.count_nonzero(subset)
+        self.frame_timer.end(drawn)
+        self.update_lod_budget(time.perf_counter() - start, drawn, gpu_time)
+        if self.view_settled and subset is not None:
+            self.refine_view()
+
     # === Mouse Events ===
     def mousePressEvent(self, event):
+        if not self.layout_ready:
+            return
         # Normalize mouse coordinates to [0,1] for both x and y.
         x = self.m_left + (event.position().x() * (self.m_right - self.m_left)) / self.width
         y = self.m_bottom + ((self.height - event.position().y()) * (self.m_top - self.m_bottom)) / self.height
 
-        # EXPANDING COHEN SUTHERLAND SEARCH ROUTINE to left mouse button single sample select
+        # EXPANDING SEARCH ROUTINE to left mouse button single sample select
         if event.button() == Qt.MouseButton.LeftButton:
-            # TUNING PARAMETERS
+            # TUNING PARAMETERS, the search box grows by 10 ** tuning per step while it hits nothing
             precision_exp = -4
             tuning = 0.005
-            precision = 10 ** precision_exp
-            
+            steps = 201
+
             # Reset clipped samples
-            self.data.clipped_count = 0
-            self.data.clipped_samples = [False for _ in range(self.data.sample_count)]
+            self.data.clipped_samples = np.zeros(self.data.sample_count, dtype=bool)
 
-            # Expand search outward for a sample
-            while self.data.clipped_count == 0 and precision_exp < -3:
+            # The grid gives the distance of the closest segment, so only the first step whose box reaches it is clipped
+            radii = 10 ** (precision_exp + tuning * np.arange(steps))
+            distance = self.data.segment_index.nearest_distance(x, y, radii[-1]) if self.data.segment_index is not None else None
+            if distance is not None:
+                precision = radii[np.searchsorted(radii, distance)]
                 self.left_rect = [x - precision, y - precision, x + precision, y + precision]
                 CLIPPING.Clipping(self.left_rect, self.data)
 
-                precision_exp += tuning
-                precision = 10 ** precision_exp
-            
-            # Cull clipped samples to only the nearest if multiple are found, can not handle direct overlap
-            if self.data.clipped_count > 1:
-                # Compute distances to each clipped sample
-                positions = self.data.positions[self.data.clipped_samples]
-                distances = np.linalg.norm(positions - np.array([x, y]), axis=1)
-                min_index = np.argmin(distances)
-                closest_sample = np.where(self.data.clipped_samples)[0][min_index]
-                self.data.clipped_samples[:] = False
-                self.data.clipped_samples[closest_sample] = True
+                # Cull clipped samples to only the nearest if multiple are found, can not handle direct overlap
+                if np.count_nonzero(self.data.clipped_samples) > 1:
+                    closest_sample = self.data.segment_index.nearest_sample(x, y, precision)
+                    if closest_sample is not None:
+                        self.data.clipped_samples[:] = False
+                        self.data.clipped_samples[closest_sample] = True
 
             self.update()
             event.accept()
             
             return super().mousePressEvent(event)
-        # END OF EXPANDING COHEN SUTHERLAND SEARCH ROUTINE
+        # END OF EXPANDING SEARCH ROUTINE
 
         if event.button() == Qt.MouseButton.RightButton:
             self.rect.append(x)
@@ -603,8 +1516,9 @@ class Plot(QOpenGLWidget):
 
             if len(self.rect) == 4:
                 QApplication.instance().restoreOverrideCursor()
-                CLIPPING.Clipping(self.rect, self.data)
-                self.all_rect.append(self.rect)
+                box = CLIPPING.ClipBox(self.rect)
+                CLIPPING.Clipping(box, self.data)
+                self.all_rect.append(box)
                 self.rect = []
                 self.update()
 
@@ -625,13 +1539,10 @@ class Plot(QOpenGLWidget):
             eps = 0.01
             if seen:
                 eps += width
+            box = CLIPPING.ClipBox([x - eps, y - eps, x + eps, y + eps])
+            CLIPPING.Clipping(box, self.data)
+            self.all_rect.append(box)
             self.rect = []
-            self.rect.append(x - eps)
-            self.rect.append(y - eps)
-            self.rect.append(x + eps)
-            self.rect.append(y + eps)
-            CLIPPING.Clipping(self.rect, self.data)
-            self.all_rect.append(self.rect)
             self.update()
             return super().mousePressEvent(event)
 
@@ -678,6 +1589,7 @@ class Plot(QOpenGLWidget):
         self.prev_vert = mouseY
 
         self.is_zooming = False
+        self.view_moved()
         self.update()
         event.accept()
 
@@ -710,160 +1622,72 @@ class Plot(QOpenGLWidget):
             self.prev_horiz = mouseX
             self.prev_vert = mouseY
 
+            self.view_moved()
             self.update()
 
         self.is_panning = False
 
         event.accept()
 
-    def draw_unhighlighted_curves_vertices(self, data, marker_vao):
+    def draw_unhighlighted_curves_vertices(self, data, marker_vao, subset=None):
         glEnable(GL_BLEND)
         glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
         hue_shift = 0.08
         glLineWidth(1)
-        class_count_one = data.class_count == 1
-        overlap_points = [0 for _ in range(data.class_count)]
-        data.overlap_indices = []  # Reset overlap indices
 
         for class_index in range(data.class_count):
             if data.active_markers[class_index]:
+                sample_count = len(data.positions[class_index]) // data.vertex_count
+                overlap_firsts, overlap_counts = self.overlap_marker_ranges[class_index]
                 for j in range(data.vertex_count):
-                    glBindVertexArray(marker_vao[class_index * data.vertex_count + j])
                     color = data.class_colors[class_index]
                     # last marker hue shift
                     if j == data.vertex_count - 1:
                         color = COLORS.shift_hue(color, hue_shift)
 
-                    was_inner = False
-                    is_inner = class_index == data.class_order[0] and not class_count_one
-                    if len(data.class_order) > 1:
-                        was_inner = (class_index == data.class_order[1])
-
-                    for pos_index in range(0, len(data.positions[class_index]), data.vertex_count):
-                        position = data.positions[class_index][pos_index + j]
-
-                        if is_inner:
-                            position = adjust_point_towards_center(position, data.attribute_count)
-                        if was_inner:
-                            position = adjust_point_towards_center(position, -data.attribute_count)
-
-                        # Check overlaps across all sectors
-                        sector_overlaps = sum(is_point_in_sector(position, sector['start_angle'], sector['end_angle']) for sector in self.sectors)
-                        is_overlap = sector_overlaps > 1
-
-                        if is_overlap:
-                            index = pos_index // data.vertex_count
-                            
-                            # count all cases in case indices less than the current
-                            size_offset = 0
-                            for k in range(class_index):
-                                size_offset += data.count_per_class[k]
-                            index += size_offset
-                            
-                            if index not in data.overlap_indices:
-                                overlap_points[class_index] += 1
-                                data.overlap_indices.append(index)
-                            
-                            if self.highlight_overlaps:
-                                glPointSize(10)
-                                glColor4ub(255, 0, 0, 255)
-
-                                glBegin(GL_POINTS)
-                                glVertex2f(*position)
-                                glEnd()
-
-                        glPointSize(5)
-                        glColor4ub(color[0], color[1], color[2], data.attribute_alpha if data.active_attributes[j] else 255)
-                        glBegin(GL_POINTS)
-                        glVertex2f(*position)
-                        glEnd()
+                    if self.highlight_overlaps and overlap_counts[j]:
+                        glBindVertexArray(self.overlap_marker_vao[class_index])
+                        glPointSize(10)
+                        glColor4ub(255, 0, 0, 255)
+                        glDrawArrays(GL_POINTS, int(overlap_firsts[j]), int(overlap_counts[j]))
+
+                    # markers are stored vertex by vertex, so marker j of every sample is one range
+                    glBindVertexArray(marker_vao[class_index])
+                    glPointSize(5)
+                    glColor4ub(color[0], color[1], color[2], data.attribute_alpha if data.active_attributes[j] else 255)
+                    if subset is None:
+                        glDrawArrays(GL_POINTS, j * sample_count, sample_count)
+                    else:
+                        draw_line_strips(j * sample_count + sample_firsts(data, class_index, subset, 1), 1, GL_POINTS)
 
                     glBindVertexArray(0)
 
-        if data.overlap_points != overlap_points:
-            data.overlap_points = overlap_points
-
-        overlap_summary = ""
-        for i in range(data.class_count):
-            overlap_summary += f"Class {i + 1} {data.class_names[data.class_order[i]]}: {data.overlap_points[i]}\n"
-        total_overlaps = len(data.overlap_indices)
-        overlap_summary += f"Total Overlaps: {total_overlaps} / {data.sample_count} samples\n= {round(100 * (total_overlaps / data.sample_count), 2)}% overlap for {round(100 * (1 - (total_overlaps / data.sample_count)), 2)}% accuracy.\n"
-        self.overlaps_textbox.setText(overlap_summary)
-        if total_overlaps > 0:
-            self.replot_overlaps_btn.setEnabled(True)
-
         glDisable(GL_BLEND)
 
-    def draw_unhighlighted_curves(self, data, line_vao):
+    def draw_unhighlighted_curves(self, data, curve_vao, subset=None):
         glEnable(GL_BLEND)
         glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
         radius = calculate_radius(data)
-        self.sectors = []
-        hue_shift_amount = 0.02
 
-        class_count_one = data.class_count == 1
+        visible = ~CLIPPING.sample_mask(data, 'clear_samples')
+        strip_length = curve_strip_length(data.vertex_count)
 
         for class_index in range(data.class_count):
-            min_angle = np.inf
-            max_angle = -np.inf
-            closest = furthest = None
-            
-            was_inner = False
-            is_inner = (class_index == data.class_order[0]) and not class_count_one
-            if len(data.class_order) > 1:
-                was_inner = (class_index == data.class_order[1])
             if data.active_classes[class_index]:
-                glBindVertexArray(line_vao[class_index])
-
-                datapoint_count = 0
-                size_index = 0
-                for j in range(data.class_count):
-                    if j < class_index:
-                        size_index += data.count_per_class[j]
-
-                for j in range(0, len(data.positions[class_index]), data.vertex_count):
-                    sub_alpha = 0
-                    for h in range(1, data.vertex_count):
-                        index = size_index + datapoint_count
-                        if index < len(data.clear_samples) and (h > data.attribute_count or data.clear_samples[index]):
-                            continue
-                        
-                        if data.trace_mode:
-                            color = shift_hue(data.class_colors[class_index], hue_shift_amount)
-                            hue_shift_amount += 0.02  # Increase hue shift for each attribute or sample
-                        elif h == data.attribute_count - 1:
-                            color = COLORS.shift_hue(data.class_colors[class_index], 0.1)  # Apply a hue shift for the last attribute
-                        else:
-                            color = COLORS.shift_hue(data.class_colors[class_index], 0)  # No hue shift if not the last attribute or not in trace mode
-                            
-                        glColor4ub(color[0], color[1], color[2], data.attribute_alpha - sub_alpha if data.active_attributes[h] else 255 - sub_alpha)
-
-                        start, end = data.positions[class_index][j + h - 1], data.positions[class_index][j + h]
-                        
-                        control1, control2 = calculate_cubic_bezier_control_points(start, end, radius, data.attribute_count, is_inner, class_index)
-
-                        # Adjust start and end for inner classes
-                        if is_inner:
-                            start = adjust_point_towards_center(start)
-                            end = adjust_point_towards_center(end)
-                        if was_inner:
-                            start = adjust_point_towards_center(start, -data.attribute_count)
-                            end = adjust_point_towards_center(end, -data.attribute_count)
-
-                        draw_cubic_bezier_curve(start, control1, control2, end, is_inner, data.attribute_count)
-
-                        angle = calculate_angle(end[0], end[1])
-                        
-                        if angle < min_angle and h == data.attribute_count - 1:
-                            min_angle = angle
-                            closest = end
-                        if angle > max_angle:
-                            max_angle = angle
-                            furthest = end
-                            
-                    datapoint_count += 1
-
+                glShadeModel(GL_FLAT)  # each curve keeps its own color past the shared joint
+                glBindVertexArray(curve_vao[class_index])
+                firsts = sample_firsts(data, class_index, visible, strip_length)
+                draw_line_strips(firsts if subset is None else sample_firsts(data, class_index, visible & subset, strip_length), strip_length)
                 glBindVertexArray(0)
+                glShadeModel(GL_SMOOTH)
+
+                if self.class_sectors[class_index] is None:
+                    continue
+                closest, furthest = self.class_sectors[class_index]
+
+                # radial lines and sector take the color of the last curve drawn for the class
+                color = self.curve_colors[class_index][firsts[-1] + strip_length - 1]
+                glColor4ub(*color)
 
                 mult = 5
                 if class_index == data.class_count-1:
@@ -880,36 +1704,14 @@ class Plot(QOpenGLWidget):
                 
                 if closest is not None and furthest is not None:
                     glColor4ub(color[0], color[1], color[2], 50)
-                    closest_angle = np.arctan2(closest[1], closest[0])
-                    furthest_angle = np.arctan2(furthest[1], furthest[0])
-
-                    if self.data.plot_type == 'SCC':
-                        # Adjust angles to be positive
-                        closest_angle = closest_angle if closest_angle >= 0 else closest_angle + 2 * np.pi
-                        furthest_angle = furthest_angle if furthest_angle >= 0 else furthest_angle + 2 * np.pi
-                    elif self.data.plot_type == 'DCC':
-                        # Ensure start_angle < end_angle for drawing the sector correctly
-                        if closest_angle < -np.pi / 2:
-                            closest_angle += 2 * np.pi
-                        if furthest_angle < -np.pi / 2:
-                            furthest_angle += 2 * np.pi
-                        closest_angle = closest_angle if closest_angle > furthest_angle else closest_angle
-                        furthest_angle = furthest_angle if furthest_angle < closest_angle else furthest_angle - 2 * np.pi
-                    if closest_angle > furthest_angle:
-                        closest_angle, furthest_angle = furthest_angle, closest_angle
-                    
+                    closest_angle, furthest_angle = sector_angles(data, closest, furthest)
+
                     sector_radius = radius * (data.class_count + 1)
 
                     # Draw the filled sector
                     if self.data.active_sectors[class_index]:
                         draw_filled_sector(closest_angle, furthest_angle, sector_radius, segments=50)
 
-                    sector_info = {
-                        'start_angle': closest_angle,
-                        'end_angle': furthest_angle
-                    }
-                    self.sectors.append(sector_info)
-
         glDisable(GL_BLEND)
 
     def replot_overlaps(self):
@@ -1,9 +1,12 @@
 import numpy as np
-import pandas as pd
-from csv import writer
-import os
 import MODEL
 
+try:
+    import pyarrow
+    import pyarrow.csv as pyarrow_csv
+except ImportError:  # optional, pandas formats the CSV rows without it
+    pyarrow_csv = None
+
 # exit codes for cohen-sutherland
 INSIDE = 0  # 0000b
 LEFT   = 1  # 0001b
@@ -14,91 +17,73 @@ TOP    = 8  # 1000b
 # Vertex clip: check if the vertex is inside the rectangle
 # Line clip: check if the line is inside the rectangle
 # End clip: check if the last vertex of the line is inside the rectangle
-def clip_display(textbox, dataset):
-    total_sample = dataset.sample_count
-    filenames = ['test_line.csv', 'test_vertex.csv', 'test_end.csv']
-    clip_types = ['Line Clip', 'Vertex Clip', 'End Clip']
-    info_string = ''
-
-    for cnt, file in enumerate(filenames):
-        df = pd.read_csv(file)
-        # get dataset name
-        name = os.path.basename(file)
+CLIP_TYPES = [('line', 'clipped_samples', 'Line Clip'), ('vertex', 'vertex_in', 'Vertex Clip'), ('end', 'last_vertex_in', 'End Clip')]
+FILE_FORMATS = {'csv': 'csv', 'parquet': 'parquet', 'feather': 'feather'}  # format -> file extension
 
-        # get class information
-        class_names = df['class'].value_counts().index.tolist()
-        count_per_class = df['class'].value_counts().tolist()
-        sample_count = len(df.index)
 
-        # display class data
-        info_string += ('Clip Type: ' + clip_types[cnt] + '  (Output File: ' + name + ')\nTotal Case Count: ' + str(sample_count) + '/' + str(total_sample) + ' ({:.2f}'.format(sample_count / total_sample * 100)) + '%)\n'
-
-        # loop through class names
-        for counter, ele in enumerate(class_names):
-            if counter == 0:
-                info_string += '\n'
-            info_string += ('Class ' + str(counter+1) + ': ' + str(ele) + '\n' + 'Class Case Count: ' + str(count_per_class[counter]) + '/' + str(dataset.count_per_class[counter]) + ' ({:.2f}'.format(count_per_class[counter] / dataset.count_per_class[counter] * 100) + '%)\n')
-        info_string += '\n'
+def sample_mask(dataset, mask_name):
+    mask = np.asarray(getattr(dataset, mask_name), dtype=bool)
+    return merge_mask(np.zeros(len(dataset.dataframe.index), dtype=bool), mask)
 
-    textbox.setText(info_string)
 
+def csv_rows(frame):
+    # format every row once so each split is only a join of its lines
+    return np.array(frame.to_csv(index=False, header=False).splitlines(keepends=True), dtype=object)
 
-def clip_files(dataset, textbox):
-    # for option 1 (lines clipped)
-    output_train1 = open('train_line.csv', 'w', newline='')
-    output_test1 = open('test_line.csv', 'w', newline='')
-    csv_writer_train1 = writer(output_train1)
-    csv_writer_test1 = writer(output_test1)
 
-    # for option 2 (vertex bounded)
-    output_train2 = open('train_vertex.csv', 'w', newline='')
-    output_test2 = open('test_vertex.csv', 'w', newline='')
-    csv_writer_train2 = writer(output_train2)
-    csv_writer_test2 = writer(output_test2)
+def write_split(frame, mask, filename, file_format, rows=None):
+    if file_format == 'parquet':
+        frame[mask].to_parquet(filename, index=False)
+    elif file_format == 'feather':
+        frame[mask].reset_index(drop=True).to_feather(filename)
+    elif pyarrow_csv is not None:
+        table = pyarrow.Table.from_pandas(frame[mask], preserve_index=False)
+        pyarrow_csv.write_csv(table, filename, pyarrow_csv.WriteOptions(quoting_style='needed'))
+    else:
+        with open(filename, 'w', newline='') as output:
+            output.write(frame.head(0).to_csv(index=False))
+            output.write(''.join(rows[mask]))
 
-    # for option 3 (last vertex (line end) bounded)
-    output_train3 = open('train_end.csv', 'w', newline='')
-    output_test3 = open('test_end.csv', 'w', newline='')
-    csv_writer_train3 = writer(output_train3)
-    csv_writer_test3 = writer(output_test3)
 
-    csv_writer_train1.writerow(np.append(np.array(dataset.attribute_names), 'class'))
-    csv_writer_test1.writerow(np.append(np.array(dataset.attribute_names), 'class'))
+def clip_display(textbox, dataset, file_format='csv'):
+    total_sample = dataset.sample_count
+    info_string = ''
 
-    csv_writer_train2.writerow(np.append(np.array(dataset.attribute_names), 'class'))
-    csv_writer_test2.writerow(np.append(np.array(dataset.attribute_names), 'class'))
+    # class of every row as an index into dataset.class_names
+    class_codes = dataset.encode_classes(dataset.dataframe['class'])
 
-    csv_writer_train3.writerow(np.append(np.array(dataset.attribute_names), 'class'))
-    csv_writer_test3.writerow(np.append(np.array(dataset.attribute_names), 'class'))
+    for name, mask_name, clip_type in CLIP_TYPES:
+        mask = sample_mask(dataset, mask_name)
+        count_per_class = np.bincount(class_codes[mask & (class_codes >= 0)], minlength=dataset.class_count)
+        sample_count = int(np.count_nonzero(mask))
+        filename = f'test_{name}.{FILE_FORMATS[file_format]}'
 
-    # build files
-    for i in range(dataset.sample_count):
-        if dataset.clipped_samples[i]:
-            csv_writer_test1.writerow(np.array(dataset.dataframe.iloc[[i]].squeeze()))
-        else:
-            csv_writer_train1.writerow(np.array(dataset.dataframe.iloc[[i]].squeeze()))
+        # display class data
+        info_string += ('Clip Type: ' + clip_type + '  (Output File: ' + filename + ')\nTotal Case Count: ' + str(sample_count) + '/' + str(total_sample) + ' ({:.2f}'.format(sample_count / total_sample * 100)) + '%)\n'
 
-        if dataset.vertex_in[i]:
-            csv_writer_test2.writerow(np.array(dataset.dataframe.iloc[[i]].squeeze()))
-        else:
-            csv_writer_train2.writerow(np.array(dataset.dataframe.iloc[[i]].squeeze()))
+        # loop through the classes present in the clip
+        for counter, class_index in enumerate(np.flatnonzero(count_per_class)):
+            if counter == 0:
+                info_string += '\n'
+            info_string += ('Class ' + str(counter+1) + ': ' + str(dataset.class_names[class_index]) + '\n' + 'Class Case Count: ' + str(count_per_class[class_index]) + '/' + str(dataset.count_per_class[class_index]) + ' ({:.2f}'.format(count_per_class[class_index] / dataset.count_per_class[class_index] * 100) + '%)\n')
+        info_string += '\n'
 
-        if dataset.last_vertex_in[i]:
-            csv_writer_test3.writerow(np.array(dataset.dataframe.iloc[[i]].squeeze()))
-        else:
-            csv_writer_train3.writerow(np.array(dataset.dataframe.iloc[[i]].squeeze()))
+    textbox.setText(info_string)
 
-    output_train1.close()
-    output_test1.close()
 
-    output_train2.close()
-    output_test2.close()
+def clip_files(dataset, textbox, file_format='csv'):
+    """Write the train (not clipped) and test (clipped) split of every clip type, one write per file."""
+    frame = dataset.dataframe[list(dataset.attribute_names) + ['class']]
+    extension = FILE_FORMATS[file_format]
+    rows = csv_rows(frame) if file_format == 'csv' and pyarrow_csv is None else None
 
-    output_train3.close()
-    output_test3.close()
+    for name, mask_name, _ in CLIP_TYPES:
+        mask = sample_mask(dataset, mask_name)
+        write_split(frame, ~mask, f'train_{name}.{extension}', file_format, rows)
+        write_split(frame, mask, f'test_{name}.{extension}', file_format, rows)
 
     # build text box
-    clip_display(textbox, dataset)
+    clip_display(textbox, dataset, file_format)
 
 
 class MinAndMax(object):
@@ -226,51 +211,188 @@ def vertex_check(vertex_x, vertex_y, min_max):
     else:
         return False
 
-def clip_samples(positions, rect, dataset):
+# Batched versions of compute_code, cohen_sutherland_clip and vertex_check which work on whole arrays of points and segments
+def compute_codes(x, y, min_max):
+    codes = np.where(x < min_max.x_min, LEFT, np.where(x > min_max.x_max, RIGHT, INSIDE))
+    codes |= np.where(y < min_max.y_min, BOTTOM, np.where(y > min_max.y_max, TOP, INSIDE))
+    return codes
+
+
+def cohen_sutherland_clip_batch(x1, y1, x2, y2, min_max):
+    shape = np.shape(x1)
+    x1, y1 = np.array(x1, dtype=float).ravel(), np.array(y1, dtype=float).ravel()
+    x2, y2 = np.array(x2, dtype=float).ravel(), np.array(y2, dtype=float).ravel()
+    code1 = compute_codes(x1, y1, min_max)
+    code2 = compute_codes(x2, y2, min_max)
+    accept = np.zeros(x1.size, dtype=bool)
+
+    # segments still being clipped, each pass moves one outside endpoint onto the rectangle edge
+    active = np.arange(x1.size)
+    while active.size:
+        c1, c2 = code1[active], code2[active]
+
+        # both endpoints lie within rectangle
+        inside = (c1 == 0) & (c2 == 0)
+        accept[active[inside]] = True
+
+        # both endpoints are outside rectangle on the same side
+        keep = ~inside & ((c1 & c2) == 0)
+        active, c1, c2 = active[keep], c1[keep], c2[keep]
+        if not active.size:
+            break
+
+        ax1, ay1, ax2, ay2 = x1[active], y1[active], x2[active], y2[active]
+        first = c1 != 0
+        code_out = np.where(first, c1, c2)
+
+        top = (code_out & TOP) != 0
+        bottom = ~top & ((code_out & BOTTOM) != 0)
+        right = ~top & ~bottom & ((code_out & RIGHT) != 0)
+        left = ~top & ~bottom & ~right & ((code_out & LEFT) != 0)
+
+        x = np.ones(active.size)
+        y = np.ones(active.size)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x[top] = ax1[top] + (ax2[top] - ax1[top]) * (min_max.y_max - ay1[top]) / (ay2[top] - ay1[top])
+            y[top] = min_max.y_max
+            x[bottom] = ax1[bottom] + (ax2[bottom] - ax1[bottom]) * (min_max.y_min - ay1[bottom]) / (ay2[bottom] - ay1[bottom])
+            y[bottom] = min_max.y_min
+            y[right] = ay1[right] + (ay2[right] - ay1[right]) * (min_max.x_max - ax1[right]) / (ax2[right] - ax1[right])
+            x[right] = min_max.x_max
+            y[left] = ay1[left] + (ay2[left] - ay1[left]) * (min_max.x_min - ax1[left]) / (ax2[left] - ax1[left])
+            x[left] = min_max.x_min
+
+        moved1, moved2 = active[first], active[~first]
+        x1[moved1], y1[moved1] = x[first], y[first]
+        code1[moved1] = compute_codes(x1[moved1], y1[moved1], min_max)
+        x2[moved2], y2[moved2] = x[~first], y[~first]
+        code2[moved2] = compute_codes(x2[moved2], y2[moved2], min_max)
+
+    return accept.reshape(shape)
+
+
+def vertex_check_batch(vertex_x, vertex_y, min_max):
+    return (min_max.x_min <= vertex_x) & (vertex_x <= min_max.x_max) & (min_max.y_min <= vertex_y) & (vertex_y <= min_max.y_max)
+
+
+def rect_min_max(rect):
     min_max = MinAndMax()
     min_max.x_min = min(rect[0], rect[2])
     min_max.x_max = max(rect[0], rect[2])
     min_max.y_min = min(rect[1], rect[3])
     min_max.y_max = max(rect[1], rect[3])
+    return min_max
 
-    cnt = 0
-    class_num = 1
-    # check each class
-    for data_class in positions:
-        # check each sample in the class
-        for sample in data_class:
-            # check each polyline in the line
-            for i in range(dataset.vertex_count - 1):
-                # Ensure the next point in the polyline exists before attempting to clip
-                if 2 * i + 3 < len(sample):
-                    is_clipped = cohen_sutherland_clip(sample[2 * i], sample[2 * i + 1], sample[2 * i + 2], sample[2 * i + 3], min_max)
-                    if is_clipped:
-                        dataset.clipped_samples[cnt] = True
-                # Regardless of clipping, check if the current vertex is inside
-                if 2 * i + 1 < len(sample):
-                    is_inside = vertex_check(sample[2 * i], sample[2 * i + 1], min_max)
-                    if is_inside and cnt < len(dataset.vertex_in):
-                        dataset.vertex_in[cnt] = True
-                # Special case for the last vertex
-                if 2 * i + 3 < len(sample):
-                    if i == dataset.vertex_count - 2:
-                        last_is_inside = vertex_check(sample[2 * i + 2], sample[2 * i + 3], min_max)
-                        if last_is_inside:
-                            dataset.vertex_in[cnt] = True
-                            dataset.last_vertex_in[cnt] = True
-            cnt += 1
-        class_num += 1
 
+def clip_block(block, min_max):
+    """
+    Clip a (samples, vertex_count, 2) block of polylines against a rectangle in one pass.
+    Returns the line clip, vertex clip and end clip masks with one entry per sample.
+    """
+    sample_count, vertex_count = block.shape[0], block.shape[1]
+    if vertex_count < 2:
+        no_clip = np.zeros(sample_count, dtype=bool)
+        return no_clip, no_clip.copy(), no_clip.copy()
+
+    starts = block[:, :-1, :]
+    ends = block[:, 1:, :]
+    segment_in = cohen_sutherland_clip_batch(starts[..., 0], starts[..., 1], ends[..., 0], ends[..., 1], min_max)
+    point_in = vertex_check_batch(block[..., 0], block[..., 1], min_max)
+
+    clipped = segment_in.any(axis=1)
+    vertex_in = point_in.any(axis=1)
+    last_vertex_in = point_in[:, -1]
+    return clipped, vertex_in, last_vertex_in
+
+
+def stack_positions(positions, vertex_count):
+    blocks = [np.reshape(np.asarray(class_positions, dtype=float), (-1, vertex_count, 2)) for class_positions in positions]
+    if not blocks:
+        return np.empty((0, vertex_count, 2))
+    return np.concatenate(blocks)
+
+
+def merge_mask(current, mask):
+    # OR the new mask into the stored one in place, ignoring samples beyond its length
+    if not isinstance(current, np.ndarray):
+        current = np.array(current, dtype=bool)
+    count = min(len(current), len(mask))
+    current[:count][mask[:count]] = True
+    return current
+
+
+def clip_samples(positions, rect, dataset):
+    min_max = rect_min_max(rect)
+
+    block = stack_positions(positions, dataset.vertex_count)
+    clipped, vertex_in, last_vertex_in = clip_block(block, min_max)
+
+    dataset.clipped_samples = merge_mask(dataset.clipped_samples, clipped)
+    dataset.vertex_in = merge_mask(dataset.vertex_in, vertex_in)
+    dataset.last_vertex_in = merge_mask(dataset.last_vertex_in, last_vertex_in)
 
-class Clipping:
-    def __init__(self, rect, dataset):
-        positions = []
-        for i in range(dataset.class_count):
-            positions.append(np.array(dataset.positions[i]))
-            num_columns = dataset.vertex_count * 2
-            num_rows = positions[i].size // num_columns
-            positions[i] = np.reshape(positions[i], (num_rows, num_columns))
 
+def clip_masks(rect, dataset):
+    """Line, vertex and end clip masks of one rectangle, without changing the dataset selection."""
+    if dataset.segment_index is not None:
+        return dataset.segment_index.clip(rect)
+    block = stack_positions(dataset.positions[:dataset.class_count], dataset.vertex_count)
+    return clip_block(block, rect_min_max(rect))
 
-        clip_samples(positions, rect, dataset)
 
+# sample masks are stored as bitsets of 64 samples per word
+def pack_mask(mask):
+    packed = np.packbits(np.asarray(mask, dtype=bool))
+    return np.pad(packed, (0, -len(packed) % 8)).view(np.uint64)
+
+
+def unpack_mask(bits, count):
+    return np.unpackbits(bits.view(np.uint8), count=count).astype(bool)
+
+
+class ClipBox(list):
+    """
+    Clip rectangle [x1, y1, x2, y2] which keeps the bitsets of the samples it clips.
+    The bitsets are recomputed only when the layout they were clipped from changes.
+    """
+    def __init__(self, rect):
+        super(ClipBox, self).__init__(rect)
+        self.layout_version = None
+        self.sample_count = 0
+        self.bits = None
+
+    def bitsets(self, dataset):
+        if self.layout_version != dataset.layout_version or self.bits is None:
+            masks = clip_masks(self, dataset)
+            self.bits = [pack_mask(mask) for mask in masks]
+            self.sample_count = len(masks[0])
+            self.layout_version = dataset.layout_version
+        return self.bits
+
+    def masks(self, dataset):
+        return [unpack_mask(bits, self.sample_count) for bits in self.bitsets(dataset)]
+
+
+def combine_boxes(boxes, dataset):
+    """OR the cached bitsets of the boxes into line, vertex and end clip masks over all samples."""
+    combined = [np.zeros(dataset.sample_count, dtype=bool) for _ in range(3)]
+    if not boxes:
+        return combined
+
+    bitsets = [box.bitsets(dataset) for box in boxes]
+    for index in range(3):
+        bits = np.bitwise_or.reduce([box_bits[index] for box_bits in bitsets])
+        combined[index] = merge_mask(combined[index], unpack_mask(bits, boxes[0].sample_count))
+    return combined
+
+
+class Clipping:
+    def __init__(self, rect, dataset):
+        if isinstance(rect, ClipBox):
+            clipped, vertex_in, last_vertex_in = rect.masks(dataset)
+        else:
+            clipped, vertex_in, last_vertex_in = clip_masks(rect, dataset)
+
+        dataset.clipped_samples = merge_mask(dataset.clipped_samples, clipped)
+        dataset.vertex_in = merge_mask(dataset.vertex_in, vertex_in)
+        dataset.last_vertex_in = merge_mask(dataset.last_vertex_in, last_vertex_in)
@@ -1,4 +1,5 @@
 import colorsys
+import numpy as np
 
 class getColors:
     def __init__(self, num_colors, bg_color, axis_color, class_names, default_colors=None, color_names=None, benign_malignant=False):
@@ -49,3 +50,23 @@ def shift_hue(rgb, amount):
     # Convert back to RGB
     r, g, b = colorsys.hsv_to_rgb(h, s, v)
     return int(r * 255), int(g * 255), int(b * 255)
+
+def shift_hues(rgb, amounts):
+    """shift_hue of one color by many amounts at once, returns an (n, 3) array of 0-255 ints."""
+    h, s, v = colorsys.rgb_to_hsv(rgb[0] / 255.0, rgb[1] / 255.0, rgb[2] / 255.0)
+    hues = (h + np.asarray(amounts, dtype=float).ravel()) % 1.0
+
+    # vectorized colorsys.hsv_to_rgb
+    i = (hues * 6.0).astype(int)
+    f = (hues * 6.0) - i
+    p = np.full_like(hues, v * (1.0 - s))
+    q = v * (1.0 - s * f)
+    t = v * (1.0 - s * (1.0 - f))
+    v = np.full_like(hues, v)
+    i = i % 6
+    r = np.choose(i, [v, q, p, p, t, v])
+    g = np.choose(i, [t, v, v, q, p, p])
+    b = np.choose(i, [p, p, t, v, v, q])
+    if s == 0.0:
+        r = g = b = v
+    return (np.column_stack((r, g, b)) * 255).astype(int)
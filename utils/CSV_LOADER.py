@@ -0,0 +1,80 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+except ImportError:  # pandas parses the file instead
+    pa_csv = None
+
+
+CHUNK_ROWS = 100000  # rows of each pandas chunk
+CHUNK_BYTES = 1 << 22  # bytes of each pyarrow block
+SAMPLE_ROWS = 1000  # rows read to find the column types
+
+
+class LoadCancelled(Exception):
+    """Raised through the progress callback to stop a load that is no longer wanted."""
+
+
+def column_dtypes(filename):
+    """
+    Column types from the first rows, so every chunk is parsed the same way. The class labels are read
+    as strings and made categorical once every chunk is in. Features stay float64, the sector and
+    clipping tests compare normalized values exactly and float32 parsing moves samples across them.
+    """
+    sample = pd.read_csv(filename, nrows=SAMPLE_ROWS)
+    if 'class' not in sample.columns:
+        raise ValueError("The file has no 'class' column.")
+    dtypes = {}
+    for name in sample.columns:
+        if name == 'class':
+            dtypes[name] = str
+        elif pd.api.types.is_numeric_dtype(sample[name]):
+            dtypes[name] = np.float64
+        else:
+            raise ValueError(f"Column '{name}' is not numeric, every attribute must be a number.")
+    return dtypes
+
+
+def class_labels(labels):
+    # numeric labels keep the type and order pandas would have inferred for them
+    labels = labels.astype('category')
+    try:
+        values = pd.to_numeric(labels.cat.categories)
+        return labels.cat.rename_categories(values).cat.reorder_categories(values.sort_values())
+    except (ValueError, TypeError):
+        return labels
+
+
+def arrow_chunks(file, dtypes):
+    types = {name: (pa.string() if dtype is str else pa.float64()) for name, dtype in dtypes.items()}
+    reader = pa_csv.open_csv(file, read_options=pa_csv.ReadOptions(block_size=CHUNK_BYTES), convert_options=pa_csv.ConvertOptions(column_types=types))
+    for batch in reader:
+        yield batch.to_pandas()
+
+
+def read_csv(filename, progress=None):
+    """
+    Read a CSV file chunk by chunk with float64 features and a categorical class column.
+    progress is called with the percentage of the file read and may raise LoadCancelled.
+    """
+    report = progress or (lambda percent: None)
+    report(0)
+    dtypes = column_dtypes(filename)
+    size = max(os.path.getsize(filename), 1)
+
+    frames = []
+    with open(filename, 'rb') as file:
+        chunks = arrow_chunks(file, dtypes) if pa_csv is not None else pd.read_csv(file, dtype=dtypes, chunksize=CHUNK_ROWS)
+        for chunk in chunks:
+            frames.append(chunk)
+            report(min(int(100 * file.tell() / size), 99))
+
+    df = pd.concat(frames, ignore_index=True) if frames else pd.read_csv(filename, dtype=dtypes)
+    if 'class' in df.columns:
+        df['class'] = class_labels(df['class'])
+    report(100)
+    return df
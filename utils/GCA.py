@@ -1,11 +1,87 @@
 from glcs import PC, SPC, DSC1, DSC2, SCC, DCC
+from utils import SPATIAL_INDEX
 
+import copy
 import numpy as np
 
+
+class LayoutCancelled(Exception):
+    """Raised through the progress callback to stop a layout that is no longer wanted."""
+
+
+def layout_state(dataset):
+    # attribute settings the positions depend on, compared by relayout
+    return (list(dataset.attribute_names), np.array(dataset.attribute_inversions, dtype=bool),
+            np.array(dataset.coefs, dtype=float), np.array(dataset.axis_vertical_shifts, dtype=float))
+
+
+def relayout(dataset):
+    """Move only the vertices of swapped, inverted, shifted or reweighted attributes, False when a full layout is needed."""
+    if dataset.layout_state is None or dataset.features is None or len(dataset.positions) != dataset.class_count:
+        return False
+    if dataset.plot_type not in ['PC', 'SCC', 'DCC'] or (dataset.plot_type == 'DCC' and dataset.scaled_attributes is None):
+        return False
+
+    names, inversions, coefs, shifts = layout_state(dataset)
+    old_names, old_inversions, old_coefs, old_shifts = dataset.layout_state
+    if sorted(names) != sorted(old_names) or len(inversions) != len(old_inversions) or len(coefs) != len(old_coefs) or len(shifts) != len(old_shifts):
+        return False
+
+    moved = np.array([name != old_name for name, old_name in zip(names, old_names)], dtype=bool)
+    if dataset.plot_type == 'PC':
+        columns = np.flatnonzero(moved | (inversions != old_inversions) | (shifts[:len(moved)] != old_shifts[:len(moved)]))
+        if len(columns):
+            PC.update_positions(dataset, columns)
+    elif dataset.plot_type == 'SCC':
+        columns = np.flatnonzero(moved | (inversions != old_inversions))
+        if len(columns):
+            SCC.update_coordinates(dataset, columns)
+    else:
+        # the arc sum after the first changed attribute is the only part that moves
+        changed = np.flatnonzero(moved | (coefs != old_coefs))
+        if len(changed):
+            DCC.update_positions(dataset, changed[0])
+
+    dataset.layout_state = (names, inversions, coefs, shifts)
+    dataset.layout_version += 1
+    dataset.segment_index = SPATIAL_INDEX.SegmentGrid(dataset.positions, dataset.vertex_count)
+    return True
+
+
+def detach(dataset, plot_type, in_place=False):
+    """
+    Copy of the dataset for a background layout, made on the GUI thread so edits made there while
+    the layout runs cannot race it. The frame is copied since the layout edits it in place, the
+    vertex arrays only for an in-place relayout, every other field is shared until the swap.
+    """
+    layout = copy.copy(dataset)
+    layout.attribute_names = list(dataset.attribute_names)
+    layout.dataframe = dataset.dataframe.copy()
+    if in_place:
+        layout.positions = [positions.copy() for positions in dataset.positions]
+        layout.all_arc_lengths = dataset.all_arc_lengths.copy()
+    layout.plot_type = plot_type
+    return layout
+
+
+def swap_layout(dataset, layout, snapshot):
+    """
+    Move every field the layout wrote into the dataset in one step. snapshot holds the dataset
+    fields from when the layout was detached, fields the layout left alone keep any newer value.
+    """
+    vars(dataset).update({name: value for name, value in vars(layout).items() if name not in snapshot or snapshot[name] is not value})
+
+
 class GCA:
-    def __init__(self, dataset):
+    def __init__(self, dataset, progress=None):
+        # progress is called with a percentage between the stages and may raise LayoutCancelled
+        report = progress or (lambda percent: None)
+        report(0)
+
         dataset.positions = []
-        
+        dataset.segment_index = None
+        dataset.layout_version += 1  # invalidates the masks cached by clip boxes
+
         if dataset.plot_type == 'PC':
             dataset.vertex_count = dataset.attribute_count
             PC.PC(dataset)
@@ -35,4 +111,12 @@ class GCA:
             DCC.DCC(dataset)
 
         else:
-            print('No type selected')    
+            print('No type selected')
+            return
+
+        # segment grid for picking and clipping, built once per layout
+        report(50)
+        dataset.segment_index = SPATIAL_INDEX.SegmentGrid(dataset.positions, dataset.vertex_count)
+        report(75)
+        dataset.layout_state = layout_state(dataset)
+        report(100)
@@ -0,0 +1,142 @@
+import numpy as np
+
+from utils import CLIPPING
+
+
+class SegmentGrid:
+    """
+    Uniform grid over the polyline segments of a layout for rectangle and point picking.
+    Each segment is bucketed into every cell its bounding box touches, so a query only
+    has to run the exact clipping tests on the segments stored in the cells it covers.
+    """
+    def __init__(self, positions, vertex_count, max_cells=256):
+        self.vertex_count = vertex_count
+        self.block = CLIPPING.stack_positions(positions, vertex_count)
+        self.sample_count = len(self.block)
+        self.segments_per_sample = max(vertex_count - 1, 0)
+
+        starts = self.block[:, :-1, :].reshape(-1, 2)
+        ends = self.block[:, 1:, :].reshape(-1, 2)
+        self.x1, self.y1 = starts[:, 0], starts[:, 1]
+        self.x2, self.y2 = ends[:, 0], ends[:, 1]
+        segment_count = len(self.x1)
+
+        if segment_count == 0:
+            self.origin = np.zeros(2)
+            self.cell_size = np.ones(2)
+            self.cells = np.ones(2, dtype=int)
+            self.cell_start = np.zeros(2, dtype=np.int64)
+            self.cell_segments = np.empty(0, dtype=np.int64)
+            return
+
+        seg_min = np.column_stack((np.minimum(self.x1, self.x2), np.minimum(self.y1, self.y2)))
+        seg_max = np.column_stack((np.maximum(self.x1, self.x2), np.maximum(self.y1, self.y2)))
+        self.origin = seg_min.min(axis=0)
+        span = np.maximum(seg_max.max(axis=0) - self.origin, 1e-12)
+
+        # cells no smaller than the typical segment so a segment lands in only a few of them
+        target = max(int(np.sqrt(segment_count)), 1)
+        typical = np.median(seg_max - seg_min, axis=0)
+        self.cell_size = np.maximum(typical, span / min(target, max_cells))
+        self.cells = np.clip(np.ceil(span / self.cell_size).astype(int), 1, max_cells)
+        self.cell_size = span / self.cells
+
+        low = self.cell_of(seg_min).astype(np.int32)
+        high = self.cell_of(seg_max).astype(np.int32)
+        widths = high[:, 0] - low[:, 0] + 1
+        heights = high[:, 1] - low[:, 1] + 1
+        per_segment = widths * heights
+
+        # expand every segment into the cells of its bounding box
+        segment_ids = np.repeat(np.arange(segment_count, dtype=np.int32), per_segment)
+        local = np.arange(per_segment.sum(), dtype=np.int32) - np.repeat((np.cumsum(per_segment) - per_segment).astype(np.int32), per_segment)
+        repeated_widths = widths[segment_ids]
+        cell_x = low[segment_ids, 0] + local % repeated_widths
+        cell_y = low[segment_ids, 1] + local // repeated_widths
+        cell_ids = (cell_y * self.cells[0] + cell_x).astype(np.uint16)  # max_cells ** 2 fits, so the stable sort is a radix sort
+
+        order = np.argsort(cell_ids, kind='stable')
+        self.cell_segments = segment_ids[order]
+        self.cell_start = np.concatenate(([0], np.cumsum(np.bincount(cell_ids, minlength=int(self.cells.prod())))))
+
+    def cell_of(self, points):
+        cell = np.floor((np.asarray(points, dtype=float) - self.origin) / self.cell_size).astype(int)
+        return np.clip(cell, 0, self.cells - 1)
+
+    def candidates(self, min_max):
+        low = self.cell_of([min_max.x_min, min_max.y_min])
+        high = self.cell_of([min_max.x_max, min_max.y_max])
+
+        # cells of one grid row are contiguous, so each row of the query is a single slice
+        rows = np.arange(low[1], high[1] + 1) * self.cells[0]
+        starts = self.cell_start[rows + low[0]]
+        stops = self.cell_start[rows + high[0] + 1]
+        if not len(self.cell_segments) or (stops - starts).sum() == 0:
+            return np.empty(0, dtype=np.int32)
+        segments = np.concatenate([self.cell_segments[a:b] for a, b in zip(starts, stops)])
+
+        # drop segments whose bounding box misses the query before the exact tests
+        x1, y1, x2, y2 = self.x1[segments], self.y1[segments], self.x2[segments], self.y2[segments]
+        overlaps = (np.minimum(x1, x2) <= min_max.x_max) & (np.maximum(x1, x2) >= min_max.x_min) & (np.minimum(y1, y2) <= min_max.y_max) & (np.maximum(y1, y2) >= min_max.y_min)
+        segments = segments[overlaps]
+
+        # a segment is stored once per cell, so only multi-cell queries can repeat it
+        if len(starts) > 1 or low[0] != high[0]:
+            segments = np.unique(segments)
+        return segments
+
+    def clip(self, rect):
+        """Line, vertex and end clip masks for a rectangle, testing only candidate segments."""
+        min_max = CLIPPING.rect_min_max(rect)
+        clipped = np.zeros(self.sample_count, dtype=bool)
+        vertex_in = np.zeros(self.sample_count, dtype=bool)
+        last_vertex_in = np.zeros(self.sample_count, dtype=bool)
+
+        segments = self.candidates(min_max)
+        if not len(segments):
+            return clipped, vertex_in, last_vertex_in
+
+        samples = segments // self.segments_per_sample
+        accepted = CLIPPING.cohen_sutherland_clip_batch(self.x1[segments], self.y1[segments], self.x2[segments], self.y2[segments], min_max)
+        clipped[samples[accepted]] = True
+
+        start_in = CLIPPING.vertex_check_batch(self.x1[segments], self.y1[segments], min_max)
+        end_in = CLIPPING.vertex_check_batch(self.x2[segments], self.y2[segments], min_max)
+        vertex_in[samples[start_in | end_in]] = True
+
+        is_last = segments % self.segments_per_sample == self.segments_per_sample - 1
+        last_vertex_in[samples[is_last & end_in]] = True
+        return clipped, vertex_in, last_vertex_in
+
+    def segment_distances(self, x, y, max_distance):
+        """Candidate segments around (x, y) and their square (L-inf) distances to it."""
+        segments = self.candidates(CLIPPING.rect_min_max([x - max_distance, y - max_distance, x + max_distance, y + max_distance]))
+        if not len(segments):
+            return segments, np.empty(0)
+
+        ax, ay = self.x1[segments] - x, self.y1[segments] - y
+        dx, dy = self.x2[segments] - self.x1[segments], self.y2[segments] - self.y1[segments]
+
+        # the max of two linear functions is minimized at an end or where they cross
+        with np.errstate(divide='ignore', invalid='ignore'):
+            crossings = np.column_stack((np.zeros_like(ax), np.ones_like(ax), (ay - ax) / (dx - dy), -(ax + ay) / (dx + dy)))
+        crossings = np.clip(np.nan_to_num(crossings, nan=0.0, posinf=0.0, neginf=0.0), 0, 1)
+        return segments, np.maximum(np.abs(ax[:, None] + crossings * dx[:, None]), np.abs(ay[:, None] + crossings * dy[:, None])).min(axis=1)
+
+    def nearest_distance(self, x, y, max_distance):
+        """Square distance from (x, y) to the closest segment, or None if none is within max_distance."""
+        segments, distances = self.segment_distances(x, y, max_distance)
+        if not len(segments) or distances.min() > max_distance:
+            return None
+        return float(distances.min())
+
+    def nearest_sample(self, x, y, max_distance):
+        """Sample with the segment closest to (x, y) by square (L-inf) distance, or None if none is within max_distance."""
+        segments, distances = self.segment_distances(x, y, max_distance)
+        if not len(segments):
+            return None
+
+        nearest = np.argmin(distances)
+        if distances[nearest] > max_distance:
+            return None
+        return int(segments[nearest] // self.segments_per_sample)